@@ -14,7 +14,7 @@ __version__ = "1.0.0"
 __all__ = ['parser', 'PDF', '_pdf', 'cli']
 
 # System libs
-import cmd, mmap, os, sys, traceback
+import cmd, os, sys, traceback
 
 # Local files
 from . import parser
@@ -47,6 +47,9 @@ class PDF:
 	# Font cache keeps track of glyph information, etc.
 	fonts = None
 
+	# Text tokenizer (from parser/text.py), one for the document so what it caches (eg, ToUnicode mappers) is kept between pages
+	tt = None
+
 	# Resource stack to descend to find resource objects
 	# This is a stack with objects pushing their Resource objects as they are encountered
 	resources = None
@@ -66,13 +69,15 @@ class PDF:
 		self.fname = fname
 
 		# Open file and mmap it (binary is important here so that python does not interpret the file as text)
+		# The mmap is made and owned by betterfile, which reads through it
 		self.f = betterfile.open(fname, 'rb')
-		self.m = mmap.mmap(self.f.fileno(), 0, prot=mmap.PROT_READ)
+		self.m = self.f.m
 
 		# Open the file and initialize it (xref/trailer reading)
 		self.p = parser.PDFTokenizer(self.f)
 		self.p.Initialize()
 
+		self.tt = parser.TextTokenizer(self.f, self.p)
 		self.fonts = FontCache(self)
 		self.resources = []
 
@@ -82,12 +87,13 @@ class PDF:
 		This object becomes useless after closing.
 		"""
 
-		self.m.close()
+		# Closes the mmap too
 		self.f.close()
 
 		self.m = None
 		self.f = None
 		self.p = None
+		self.tt = None
 
 	# --------------------------------------------------------------------------------
 	# Helper functions
@@ -307,7 +313,7 @@ class PDF:
 		page = self.GetPage(page)
 
 		# The text tokenizer
-		tt = parser.TextTokenizer(self.f, self.p)
+		tt = self.tt
 
 		# Concatenate all of the contents into a single text string
 		cts = page.Contents
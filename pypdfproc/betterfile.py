@@ -1,39 +1,93 @@
 
-import os
+import io, mmap, os
 
 class betterfile:
+	# Underlying file object
+	f = None
+
+	# Read-only mmap of the file for fast scanning, None if the file cannot be mapped (eg, empty file)
+	m = None
+
 	@staticmethod
 	def open(fname, mode):
 		o = betterfile()
 		o.f = open(fname, mode)
+
+		try:
+			o.m = mmap.mmap(o.f.fileno(), 0, access=mmap.ACCESS_READ)
+		except (ValueError, OSError, io.UnsupportedOperation):
+			o.m = None
+
 		return o
 
 	def close(self):
+		if self.m != None:
+			self.m.close()
+			self.m = None
+
 		self.f.close()
 		self.f = None
 
 	def fileno(self):
 		return self.f.fileno()
 
+	def willneed(self, offset, length):
+		"""
+		Hints the OS to start reading @length bytes at @offset into the page cache in the background.
+		Does nothing where posix_fadvise is not available.
+		"""
+
+		if hasattr(os, 'posix_fadvise'):
+			try:
+				os.posix_fadvise(self.f.fileno(), offset, length, os.POSIX_FADV_WILLNEED)
+			except OSError:
+				pass
+
+	# When the file is mapped, peek/seek/tell/read work on the mmap so reads are copies out of the page cache rather than system calls
+	# NB: the underlying file's position does not follow the mmap's, so none of these can mix the two
+
 	def peek(self, n):
+		if self.m != None:
+			pos = self.m.tell()
+			return self.m[pos:pos+n]
+
 		return self.f.peek(n)
 
 	def seek(self, off, whence=os.SEEK_SET):
+		if self.m != None:
+			self.m.seek(off, whence)
+			return self.m.tell()
+
 		ret = self.f.seek(off, whence)
 		return ret
 
 	def tell(self):
+		if self.m != None:
+			return self.m.tell()
+
 		pos = self.f.tell()
 		return pos
 
 	def read(self, cnt=-1):
+		if self.m != None:
+			if cnt == None or cnt < 0:
+				return self.m.read()
+			return self.m.read(cnt)
+
 		c = self.f.read(cnt)
 		return c
 
 	def readline(self):
+		if self.m != None:
+			return self._readline_mmap()
+
 		line = bytearray()
+
+		# Bound to locals on purpose: this runs once per byte, and locals avoid an attribute lookup each time
+		read = self.f.read
+		append = line.append
 		while True:
-			s = self.read(1)
+			s = read(1)
 
 			if len(s) == 0:
 				return line
@@ -42,7 +96,7 @@ class betterfile:
 			if s == b'\r':
 				p = self.peek(1)
 				# CRLF
-				if len(p) and p[0] == b'\n':
+				if p[:1] == b'\n':
 					self.f.read(1) # Consume LF
 					if not len(line): line = bytearray('\n', 'latin-1')
 					return line
@@ -57,7 +111,43 @@ class betterfile:
 				if not len(line): line = bytearray('\n', 'latin-1')
 				return line
 			else:
-				line.append(ord(s))
+				append(s[0])
+
+	def _readline_mmap(self):
+		"""
+		Same as readline but finds the end-of-line in the mmap with find.
+		"""
+
+		m = self.m
+		size = len(m)
+		pos = m.tell()
+
+		# Find the next CR or LF, searching forward a block at a time
+		eol = -1
+		start = pos
+		while eol == -1 and start < size:
+			stop = min(size, start + 4096)
+			# A CR only matters if it comes before the LF, so search no further than that
+			lf = m.find(b'\n', start, stop)
+			cr = m.find(b'\r', start, stop if lf == -1 else lf)
+			eol = lf if cr == -1 else cr
+			start = stop
+
+		# Hit end of file
+		if eol == -1:
+			m.seek(size)
+			return bytearray(m[pos:size])
+
+		line = bytearray(m[pos:eol])
+
+		# Consume the end-of-line, both bytes of a CRLF
+		nxt = eol + 1
+		if m[eol] == 0x0D and nxt < size and m[nxt] == 0x0A:
+			nxt += 1
+		m.seek(nxt)
+
+		if not len(line): line = bytearray('\n', 'latin-1')
+		return line
 
 	# Non-standard functions
 
@@ -66,7 +156,7 @@ class betterfile:
 			return 0
 
 		# One step forward, two steps back
-		c = self.f.read(1)
+		c = self.read(1)
 		self.seek(-2, os.SEEK_CUR)
 
 		return c
@@ -78,55 +168,101 @@ class betterfile:
 
 		self.seek(-1, os.SEEK_END)
 
-	def readlinerev(self, n=1):
+	def readlinerev(self, n=1, chunk=8192):
 		"""
-		Helper function that reads @n lines in reverse.
+		Helper function that reads @n lines in reverse, scanning backward @chunk bytes at a time.
 		"""
 
 		if n == 1:
-			return self._readlinerev()
+			return self._readlinerev(chunk)
 
 		lines = []
 		for i in range(n):
-			lines.append(self._readlinerev())
+			lines.append(self._readlinerev(chunk))
 		return lines
 
-	def _readlinerev(self):
+	def _readlinerev(self, chunk=8192):
 		"""
 		Helper function that reads a single line in reverse.
+		Scans backward a block at a time for the end-of-line with rfind rather than reading byte-by-byte.
 		"""
 
-		line = bytearray()
+		# Current byte is included in the line (same as readrev)
+		pos = self.tell()
+		if pos == 0:
+			return bytearray()
+
+		if self.m != None:
+			return self._readlinerev_mmap(pos)
+
+		# Find the preceding CR or LF, searching backward a block at a time
+		# Blocks without one are kept as the end of the line so nothing is read twice
+		tail = []
+		stop = pos + 1
 		while True:
-			s = self.readrev()
+			start = max(0, stop - chunk)
+			block = self._slice(start, stop)
+			# A CR only matters if it comes after the LF, so search no further back than that
+			lf = block.rfind(b'\n')
+			cr = block.rfind(b'\r', lf+1)
+			i = lf if cr == -1 else cr
+			if i != -1 or start == 0:
+				break
+
+			tail.append(block)
+			stop = start
+
+		tail.append(block[i+1:])
+		# Only references to whole blocks are reversed (usually just one), so a deque with appendleft would gain nothing
+		tail.reverse()
+		# Joined straight into the bytearray that is returned, rather than joined and then copied
+		line = bytearray().join(tail)
+		if not len(line): line = bytearray('\n', 'latin-1')
+
+		# Position at the last byte of the previous line, skipping the CR of a CRLF
+		eol = start + i
+		if i == -1 or eol == 0:
+			self.seek(0)
+		elif block[i] == 0x0A and (block[i-1] if i > 0 else self._slice(eol-1, eol)[0]) == 0x0D:
+			self.seek(max(0, eol-2))
+		else:
+			self.seek(eol-1)
+
+		return line
+
+	def _readlinerev_mmap(self, pos):
+		"""
+		Same as _readlinerev but finds the end-of-line with rfind on the mmap itself, so no blocks are copied out to search.
+		"""
 
-			if len(s) == 0:
-				if len(line) > 0:
-					return line
+		m = self.m
+		stop = pos + 1
 
-			# LF or CRLF
-			if s == b'\n':
-				ss = self.readrev()
+		# A CR only matters if it comes after the LF, so search no further back than that
+		lf = m.rfind(b'\n', 0, stop)
+		cr = m.rfind(b'\r', lf+1, stop)
+		eol = lf if cr == -1 else cr
 
-				# CRLF
-				if ss == b'\r':
-					if not len(line): line = bytearray('\n', 'latin-1')
-					return line
+		line = bytearray(m[eol+1:stop])
+		if not len(line): line = bytearray('\n', 'latin-1')
 
-				# Just LF
-				else:
-					# Un-read the @ss character
-					self.seek(1, os.SEEK_CUR)
+		# Leave the mmap where _readlinerev leaves the file, with the whole end-of-line known from the mmap without reading a byte back
+		if eol <= 0:
+			m.seek(0)
+		elif m[eol] == 0x0A and m[eol-1] == 0x0D:
+			m.seek(max(0, eol-2))
+		else:
+			m.seek(eol-1)
 
-					if not len(line): line = bytearray('\n', 'latin-1')
-					return line
+		return line
 
-			# CR
-			elif s == b'\r':
-				if not len(line): line = bytearray('\n', 'latin-1')
-				return line
+	def _slice(self, start, stop):
+		"""
+		Returns bytes [@start,@stop) of the file from the mmap, or by reading the file if it could not be mapped.
+		"""
 
-			else:
-				# Insert at start
-				line.insert(0, ord(s))
+		if self.m != None:
+			return self.m[start:stop]
 
+		self.f.seek(start)
+		return self.f.read(stop - start)
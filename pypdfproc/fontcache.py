@@ -3,7 +3,6 @@ Font cache used to speed up repetative glyph lookups.
 """
 
 # Local files
-from . import parser
 from . import encodingmap as _encodingmap
 from . import pdf as _pdf
 from .glyph import Glyph
@@ -12,6 +11,9 @@ from .parser import CFFTokenizer
 from .cmap_identity_h import CMapIdentityH
 from .cmap_identity_v import CMapIdentityV
 
+# Returned by the glyph and font map lookups in GetGlyph when there is no entry, since None could be what was cached
+_MISS = object()
+
 class FontCache:
 	"""
 	Font cache for various font information to speed-up glyph lookups.
@@ -47,17 +49,19 @@ class FontCache:
 		"""
 
 		# Get glyph from cache if it's there
-		if oid in self.glyph_map:
-			if cid in self.glyph_map[oid]:
-				return self.glyph_map[oid][cid]
+		# Every glyph drawn comes through here so a hit is one lookup per map rather than a test and then a fetch
+		glyphs = self.glyph_map.get(oid)
+		if glyphs != None:
+			g = glyphs.get(cid, _MISS)
+			if g is not _MISS:
+				return g
 
 		# Get font from PDF or cache
-		if oid not in self.font_map:
+		f = self.font_map.get(oid, _MISS)
+		if f is _MISS:
 			f = self.pdf.p.GetFont(oid)
 			self.font_map[oid] = f
-			self.glyph_map[oid] = {}
-		else:
-			f = self.font_map[oid]
+			self.glyph_map[oid] = glyphs = {}
 
 		# ------------------------------------------------------
 
@@ -80,7 +84,7 @@ class FontCache:
 
 		# Cache glyph
 		# NB: do not change this to use g.cid instead of cid (see note above about WinAnsiEncoding and bullet)
-		self.glyph_map[oid][cid] = g
+		glyphs[cid] = g
 
 		return g
 
@@ -94,7 +98,7 @@ class FontCache:
 
 		# Cache instance if not present
 		if oid not in self.type0_map:
-			self.type0_map[oid] = Type0FontCache(f)
+			self.type0_map[oid] = Type0FontCache(f, self.pdf.tt)
 
 		# Get glyph
 		return self.type0_map[oid].GetGlyph(cid)
@@ -200,7 +204,7 @@ class FontCache:
 		if enc.oid not in self.diff_map:
 			self.diff_map[ enc.oid ] = DifferencesArrayToMap(enc.Differences)
 		if cmap and not cmap.CMapper:
-			cmap.CMapper = parser.CMapTokenizer().BuildMapper(cmap.Stream)
+			cmap.CMapper = self.pdf.tt.GetCMapper(f)
 
 		# Bounds checking since these error strings are more descriptive than KeyErrors
 		if cid not in self.diff_map[enc.oid] and cid not in encmap:
@@ -379,12 +383,16 @@ class Type0FontCache:
 	# Maps CDI to width
 	widthmap = None
 
-	def __init__(self, f):
+	# Text tokenizer (parser.TextTokenizer) that builds the ToUnicode mapper
+	tt = None
+
+	def __init__(self, f, tt):
 		"""
-		Type0 font cache for the font @f.
+		Type0 font cache for the font @f, with ToUnicode mapper built through text tokenizer @tt.
 		"""
 
 		self.font = f
+		self.tt = tt
 		self.widthmap = {}
 
 		# Index widths by CID
@@ -406,24 +414,12 @@ class Type0FontCache:
 			elif self.f.Encoding == 'Identity-V':
 				cmap = CMapIdentityV()
 			else:
-				for subf in self.font.DescendantFonts:
-					print(['subf', subf.getsetprops()])
-					print(['subf desc', subf.FontDescriptor.getsetprops()])
-
-					ff3 = subf.FontDescriptor.FontFile3
-
-					print(['fontfile3', ff3])
-					t = parser.CFFTokenizer(ff3.Stream)
-					t.Parse()
-					t.DumpBinary()
-					print(t.tzdat['Top DICT INDEX'])
-					print(t.tzdat['CharStrings INDEX'])
-					print(t.tzdat['Charset'])
-					raise NotImplementedError()
+				# Would have to map through the descendant fonts' CFF (FontFile3) charsets
+				raise NotImplementedError("Type0 font without a ToUnicode CMap or Identity-H/Identity-V encoding is not supported: '%s'" % (self.font.oid,))
 
 
 		if not cmap.CMapper:
-			cmap.CMapper = parser.CMapTokenizer().BuildMapper(cmap.Stream)
+			cmap.CMapper = self.tt.GetCMapper(self.font)
 
 		# Map CID
 		try:
@@ -438,8 +434,6 @@ class Type0FontCache:
 				raise
 
 		if cid not in self.widthmap:
-			print(['f', self.font])
-			print(['u', u])
 			raise KeyError('Could not find glyph CID %d in width array: %s' % (cid, self.widthmap))
 
 		# Create glyph information
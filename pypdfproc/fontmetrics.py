@@ -11,10 +11,32 @@ Font metric data is loaded, parsed, and stored via the following classes:
 * FontMetricsData_String loads from a text string
 """
 
+import hashlib, weakref
 from zipfile import ZipFile
 
 from . import parser
 
+# Tokenizers of parsed font metrics text (each holds the header and parses the rest on demand), keyed by a digest of the text
+# Loading the same font more than once (eg, multiple managers) shares the CharMetrics/Kerning/etc. objects
+# Values are weak so that a tokenizer, and the AFM text it holds, is freed once no FontMetricsData is using it
+_PARSED_BY_HASH = weakref.WeakValueDictionary()
+
+def _parsetext(txt):
+	"""
+	Parses the header of the font metrics text @txt and returns a 2-tuple of (header data dictionary, tokenizer).
+	The tokenizer parses the CharMetrics and KernPairs sections on demand (see FontMetricsData).
+	Text identical to that of a font still loaded is not parsed again; only the top-level dictionary is copied for each caller.
+	"""
+
+	h = hashlib.sha1(txt.encode('utf-8')).digest()
+
+	t = _PARSED_BY_HASH.get(h)
+	if t == None:
+		t = parser.FontMetricsTokenizer(txt)
+		_PARSED_BY_HASH[h] = t
+
+	return t.ParseHeader(),t
+
 class FontMetricsManager:
 	"""
 	Manager class
@@ -122,34 +144,93 @@ class FontMetricsData:
 	All of the properties should be self-explanatory, otherwise see the font metrics specification.
 	"""
 
-	# This is the value that accompanies the StartFontMetrics line; not the Version line below (font program version)
-	FMVersion = None
-
-	Ascender = None
-	CapHeight = None
-	CharacterSet = None
-	Comments = None
-	Descender = None
-	EncodingScheme = None
-	FontBBox = None
-	FontName = None
-	FullName = None
-	FamilyName = None
-	IsFixedPitch = None
-	ItalicAngle = None
-	Notice = None
-	StdHW = None
-	StdVW = None
-	UnderlinePosition = None
-	UnderlineThickness = None
-	# Font program version (matches FontInfo dictionary of the font program); not the font metrics version
-	Version = None
-	Weight = None
-	XHeight = None
-
-	CharMetrics = None
-	Ligatures = None
-	Kerning = None
+	# Fixed set of AFM fields, so no per-instance __dict__ is needed
+	__slots__ = (
+		# This is the value that accompanies the StartFontMetrics line; not the Version line below (font program version)
+		'FMVersion',
+
+		'Ascender',
+		'CapHeight',
+		'CharacterSet',
+		'Comments',
+		'Descender',
+		'EncodingScheme',
+		'FontBBox',
+		'FontName',
+		'FullName',
+		'FamilyName',
+		'IsFixedPitch',
+		'ItalicAngle',
+		'Notice',
+		'StdHW',
+		'StdVW',
+		'UnderlinePosition',
+		'UnderlineThickness',
+		# Font program version (matches FontInfo dictionary of the font program); not the font metrics version
+		'Version',
+		'Weight',
+		'XHeight',
+
+		# Backing for the CharMetrics, Ligatures, and Kerning properties
+		'_CharMetrics',
+		'_Ligatures',
+		'_Kerning',
+
+		# Tokenizer that parses the CharMetrics and KernPairs sections on first access; released once both are parsed
+		'_Tokenizer',
+
+		# Name of the file the data was loaded from, if loaded from a file
+		'filename',
+	)
+
+	def __init__(self):
+		# Slots have no class-level default, so explicitly default everything to None
+		for k in FontMetricsData.__slots__:
+			setattr(self, k, None)
+
+	def _SetData(self, dat, tokenizer):
+		"""
+		Applies the parsed header data dictionary @dat to this object.
+		The CharMetrics and KernPairs sections are left in @tokenizer until they are first accessed.
+		"""
+
+		# NB: slots mean there is no __dict__ to update in one go as the PDF objects do, so this stays a setattr per key
+		for k,v in dat.items():
+			setattr(self, k, v)
+
+		self._Tokenizer = tokenizer
+
+	def _ReleaseTokenizer(self):
+		"""
+		Drops the tokenizer once everything it holds has been parsed.
+		"""
+
+		if self._CharMetrics != None and self._Kerning != None:
+			self._Tokenizer = None
+
+	def get_CharMetrics(self):
+		if self._CharMetrics == None:
+			self._CharMetrics,self._Ligatures = self._Tokenizer.ParseCharMetrics()
+			self._ReleaseTokenizer()
+
+		return self._CharMetrics
+	CharMetrics = property(get_CharMetrics, doc="Character metrics indexed by character name, parsed on first access")
+
+	def get_Ligatures(self):
+		if self._Ligatures == None:
+			self._CharMetrics,self._Ligatures = self._Tokenizer.ParseCharMetrics()
+			self._ReleaseTokenizer()
+
+		return self._Ligatures
+	Ligatures = property(get_Ligatures, doc="Ligatures from the character metrics, parsed on first access")
+
+	def get_Kerning(self):
+		if self._Kerning == None:
+			self._Kerning = self._Tokenizer.ParseKerning()
+			self._ReleaseTokenizer()
+
+		return self._Kerning
+	Kerning = property(get_Kerning, doc="Kerning data with kerning pairs under 'Pairs', parsed on first access")
 
 	def GetCharacter(self, val):
 		"""
@@ -296,38 +377,42 @@ class FontMetricsData_File(FontMetricsData):
 	Font metrics data loaded from a file.
 	"""
 
+	__slots__ = ()
+
 	def __init__(self, filename):
 		"""
 		Parses the font metrics file with filename @filename.
 		All font metrics data is then applied to this object for use.
 		"""
 
+		FontMetricsData.__init__(self)
+
 		self.filename = filename
 
 		f = open(filename, 'r')
 		txt = f.read()
 		f.close()
 
-		t = parser.FontMetricsTokenizer(txt)
-
 		# Parse and then set data on this object
-		dat = t.Parse()
-		self.__dict__.update(dat)
+		dat,t = _parsetext(txt)
+		self._SetData(dat, t)
 
 class FontMetricsData_String(FontMetricsData):
 	"""
 	Font metrics data loaded from a text string.
 	"""
 
+	__slots__ = ()
+
 	def __init__(self, txt):
 		"""
 		Parses the font metrics file when supplied as a string
 		All font metrics data is then applied to this object for use.
 		"""
 
-		t = parser.FontMetricsTokenizer(txt)
+		FontMetricsData.__init__(self)
 
 		# Parse and then set data on this object
-		dat = t.Parse()
-		self.__dict__.update(dat)
+		dat,t = _parsetext(txt)
+		self._SetData(dat, t)
 
@@ -1,4 +1,4 @@
-import os, struct
+import bisect, os, re, struct, sys, warnings
 
 from . import pdf as pdfloc
 from . import text as textloc
@@ -11,6 +11,62 @@ from .. import pdf as _pdf
 
 __all__ = ['PDFTokenizer', 'TextTokenizer', 'CMapTokenizer', 'CFFTokenizer', 'ObjectStreamTokenizer', 'FontMetricsTokenizer', 'State']
 
+# Maximum number of xref/trailer combos followed through /Prev before giving up
+MAX_PREV_DEPTH = 512
+
+# Object definition (i.e., "INT INT obj") at the start of raw file bytes
+_OBJ_HEADER = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj\b')
+
+# Remainder of trailer text after the dictionary (i.e., "startxref INT %%EOF"), using the PDF lexer's whitespace
+_TRAILER_STARTXREF = re.compile(r'[\t\r\n ]*startxref[\t\r\n ]*([-+]?\d+)[\t\r\n ]*%%EOF')
+
+# Marks a cache miss where None is a valid cached value
+_MISS = object()
+
+# Font metrics header keys by token type, so ParseHeader does one lookup per token instead of walking a chain of comparisons
+_FM_HEADER_KEYS = {
+	'StartFontMetrics':		'FMVersion',
+	'Ascender':				'Ascender',
+	'CapHeight':			'CapHeight',
+	'CharacterSet':			'CharacterSet',
+	'Descender':			'Descender',
+	'EncodingScheme':		'EncodingScheme',
+	'FontBBox':				'FontBBox',
+	'FontName':				'FontName',
+	'FullName':				'FullName',
+	'FamilyName':			'FamilyName',
+	'IsFixedPitch':			'IsFixedPitch',
+	'ItalicAngle':			'ItalicAngle',
+	'Notice':				'Notice',
+	'StdHW':				'StdHW',
+	'StdVW':				'StdVW',
+	'UnderlinePosition':	'UnderlinePosition',
+	'UnderlineThickness':	'UnderlineThickness',
+	'Version':				'Version',
+	'Weight':				'Weight',
+	'XHeight':				'XHeight',
+}
+
+# Underscore-prefixed attribute names keyed by PDF dictionary key so each is only built (and interned) once
+_RAWNAMES = {}
+
+def _SetRawAttributes(r, d):
+	"""
+	Sets every key of dictionary @d on pdf.PDFHigherBase object @r as the underscore-prefixed raw value (eg, Parent is set as _Parent)
+	that the dynamic loader works from, in one update of the instance dictionary.
+	@d is a python dictionary, eg pdf.Dictionary.dictionary or from TokenHelpers.Convert_DictAttributes.
+	"""
+
+	names = _RAWNAMES
+	attrs = {}
+	for k,v in d.items():
+		n = names.get(k)
+		if n == None:
+			n = names[k] = sys.intern('_' + k)
+		attrs[n] = v
+
+	r.__dict__.update(attrs)
+
 # --------------------------------------------------------------------------------------------------------
 # --------------------------------------------------------------------------------------------------------
 # --------------------------------------------------------------------------------------------------------
@@ -19,26 +75,24 @@ __all__ = ['PDFTokenizer', 'TextTokenizer', 'CMapTokenizer', 'CFFTokenizer', 'Ob
 def cuttokens(toks, starttok, endtok):
 	start,end = None,None
 
-	for i in range(len(toks)):
-		tok = toks[i]
-
-		if tok.type == starttok:
+	for i,tok in enumerate(toks):
+		t = tok.type
+		if t == starttok:
 			start = i
-		elif tok.type == endtok:
+		elif t == endtok:
 			end = i
+		else:
+			continue
 
-		if start and end:
+		# Compared against None since the start token can legitimately be the first token
+		if start != None and end != None:
 			break
 
 	# Not found
 	if start == None or end == None:
 		return toks,None
 
-	pretoks = toks[:start]
-	subtoks = toks[start:end+1]
-	endtoks = toks[end+1:]
-
-	return (pretoks+endtoks,subtoks)
+	return (toks[:start] + toks[end+1:], toks[start:end+1])
 
 # --------------------------------------------------------------------------------------------------------
 # --------------------------------------------------------------------------------------------------------
@@ -56,6 +110,29 @@ class PDFTokenizer:
 	# PDF object (i.e., _pdf.PDF); must keep a copy so other functions can build upon it as needed
 	pdf = None
 
+	# Parsed xref and trailer sections keyed by offset, value is (object, file position after the section)
+	xrefcache = None
+	trailercache = None
+
+	# Hit/miss counters for the above, keyed by cache name
+	cachestats = None
+
+	# Last few objects returned by GetObject as (IndirectObject, object) pairs, newest first
+	# The same few references (fonts, resources) are fetched over and over, so these are checked by identity before hashing a key
+	hotobjects = None
+	HOTOBJECTS_SIZE = 4
+
+	# State of the /Prev chain of xref sections, which are read newest first and only as far as needed
+	# Offset of the next (older) section to read, zero once the chain is exhausted
+	xrefnext = None
+	# Offsets of sections already read, to stop on cyclic /Prev chains
+	xrefvisited = None
+	# Most recently read xref and trailer, which the next section read is linked to
+	xrefprev = None
+	trailerprev = None
+	# True while a section is being read, so reading it can't start on the next one
+	xrefreading = False
+
 	def __init__(self, file):
 		if not hasattr(file, 'read'):		raise TypeError('PDF file object has no read() method')
 		if not hasattr(file, 'seek'):		raise TypeError('PDF file object has no seek() method')
@@ -63,126 +140,215 @@ class PDFTokenizer:
 
 		self.file = file
 		self.pdf = None
+		self.xrefcache = {}
+		self.trailercache = {}
+		self.cachestats = {'xref': [0,0], 'trailer': [0,0]}
+		self.hotobjects = []
 
 	def Initialize(self):
 		"""
 		Initializes PDF reading by creating a PDF object.
-		In order for this object to be useful, the xref/trailer combo must be read in its entirety.
-		Thus, this reads the xref sections but does not parse any objects.
+		This reads only the newest xref section; older sections along the /Prev chain are read by _ReadNextXRef when
+		an object or the root is not found in the sections read so far (see LoadXRefChain to read them all up front).
+		No objects are parsed.
 		"""
 
 		self.pdf = _pdf.PDF()
+		self.hotobjects = []
 
 		# Read header line
 		h = self.ParseHeader(0)
 		self.pdf.AddContentToMap(0, h)
 
 
-		# Read trailer at end of file
-		self.file.gotoend()
+		# Read tail of the file and find the last startxref (spec puts it in the last ~1 KB)
+		# One read and one rfind per window, with the offset parsed straight from the bytes (no line-by-line reverse reads or lexing)
+		# Retry with larger windows for files with junk appended after %%EOF
+		size = self.file.seek(0, os.SEEK_END)
+		sx = -1
+		for window in (4096, 8192, 65536):
+			n = min(size, window)
+			self.file.seek(size - n)
+			tail = self.file.read(n)
 
-		# Iterate backward until first "xref" is found, which is followed by the end trailer
-		lines = []
-		while True:
-			l = self.file.readlinerev()
-			if len(l) == 0:
-				print(lines)
-				raise Exception("Unable to finish reading backward to find xref: offset=%d" % self.file.tell())
+			sx = tail.rfind(b'startxref')
+			if sx != -1 or n == size:
+				break
 
-			line = l.decode('latin-1').rstrip()
-			lines.append(line)
+		if sx == -1:
+			raise Exception("Unable to find startxref in last %d bytes of file" % n)
 
-			if line == "startxref":
-				break
+		# Integer offset to the last xref follows the keyword
+		parts = tail[sx+9:].split(None, 1)
+		if not len(parts) or not parts[0].isdigit():
+			raise TypeError("Expected int after startxref at offset=%d" % (size - n + sx))
 
-		lines.reverse()
+		offset = int(parts[0])
+		#print(['offset', offset])
 
-		toks = pdfloc.TokenizeString("\r\n".join(lines))
-		toks = pdfloc.ConsolidateTokens(toks)
-		#print(['toks start', toks])
+		self.xrefnext = offset
+		self.xrefvisited = set()
+		self.xrefprev = None
+		self.trailerprev = None
+		self.xrefreading = False
 
-		if toks[0].type != 'xref_start':	raise TypeError("Expected xref_start token, got '%s' instead" % toks[0].type)
-		if toks[1].type != 'INT':			raise TypeError("Expected int token, got '%s' instead" % toks[1].type)
-		if toks[2].type != 'EOF':			raise TypeError("Expected EOF token, got '%s' instead" % toks[2].type)
+		# Older sections are read through the PDF object too (see PDF.MakeXRefMap)
+		self.pdf.xrefloader = self.LoadXRefChain
 
-		offset = toks[1].value
-		#print(['offset', offset])
+		# Newest section only, which is all a file without incremental updates has
+		self._ReadNextXRef()
 
-		x = None
-		t = None
+		# Could return self.pdf but I don't see the need at this point (keep it interal)
+		#return self.pdf
+		pass
+
+	def LoadXRefChain(self):
+		"""
+		Reads every remaining xref section in the /Prev chain, for callers that need all of them (eg, to walk PDF.rootxref).
+		Set as PDF.xrefloader by Initialize, so PDF.MakeXRefMap calls it.
+		"""
 
-		prevx = None
-		prevt = None
+		while self._ReadNextXRef():
+			pass
 
-		# Iterate until startxref in the trailer is zero, which means the end of the chain
-		while offset != 0:
-			# Parse xref
-			x = self.ParseXRef(offset)
-			self.pdf.AddContentToMap(offset, x)
+	def _ReadNextXRef(self):
+		"""
+		Reads the next (older) xref section, and its trailer, in the /Prev chain, links it to the sections already read
+		and adds its objects to the object map.
+		Returns False if there are no more sections to read.
+		If the section fails to parse then the exception is raised and the chain is left where it was, so the next call
+		tries the same section again rather than quietly dropping it and everything older.
+		"""
 
-			#print(['xx', x])
+		offset = self.xrefnext
+		if offset == None or offset == 0:
+			return False
 
-			if isinstance(x, _pdf.XRefStream):
-				# XRef stream doesn't have a trailer associated, so skip to next ("Prev" in PDF nomenclature) xref/trailer combo
-				if 'Prev' in x.Dict:
-					offset = x.Dict['Prev']
-				else:
-					# Done
-					offset = 0
+		# Nothing more to read while this one is being read (eg, LoadObject for a stream length while parsing an xref stream)
+		if self.xrefreading:
+			return False
 
-			elif isinstance(x, _pdf.XRef):
-				offset = self.file.tell()
+		visited = self.xrefvisited
+		if offset in visited:
+			self.xrefnext = 0
+			return False
 
-				# Parse trailer that follows the xref section
-				t = self.ParseTrailer(offset)
-				self.pdf.AddContentToMap(offset, t)
+		if len(visited) >= MAX_PREV_DEPTH:
+			warnings.warn("Stopped following /Prev xref chain after %d sections at offset=%d, xref may be incomplete" % (MAX_PREV_DEPTH, offset))
+			self.xrefnext = 0
+			return False
 
-				# Cross-link these
-				x.trailer = t
-				t.xref = x
+		self.xrefreading = True
+		try:
+			nextoffset = self._ReadXRef(offset)
+		finally:
+			self.xrefreading = False
 
-				# Next xref is located here (if zero then no more)
-				if 'Prev' in t.dictionary:
-					#print('jump to prev')
-					offset = t.dictionary['Prev']
-				else:
-					offset = t.startxref.offset
+		visited.add(offset)
+		self.xrefnext = nextoffset
+		return True
 
+	def _ReadXRef(self, offset):
+		"""
+		Does the work of _ReadNextXRef for the section at @offset.
+		Returns the offset of the next (older) section, zero if there is none.
+		"""
+
+		prevx = self.xrefprev
+		prevt = self.trailerprev
+		t = None
+
+		# Parse xref
+		x = self.ParseXRef(offset)
+		self.pdf.AddContentToMap(offset, x)
+
+		#print(['xx', x])
+
+		if isinstance(x, _pdf.XRefStream):
+			# XRef stream doesn't have a trailer associated, so skip to next ("Prev" in PDF nomenclature) xref/trailer combo
+			if 'Prev' in x.Dict:
+				offset = x.Dict['Prev']
 			else:
-				raise TypeError("Unrecognized xref object type: %s" % x)
+				# Done
+				offset = 0
 
-			# Link this xref/trailer combo to previous combo
-			x.next = prevx
-			if t: t.next = prevt
+		elif isinstance(x, _pdf.XRef):
+			offset = self.file.tell()
 
-			# Need to set root xref section in PDF object (this means prevx has not been set yet, so it is None)
-			if prevx == None:
-				self.pdf.rootxref = x
+			# Parse trailer that follows the xref section
+			t = self.ParseTrailer(offset)
+			self.pdf.AddContentToMap(offset, t)
 
-			# Link previous xref/trailer combo to this combo
-			if prevx != None:	prevx.prev = x
-			if prevt != None:	prevt.prev = t
+			# Cross-link these
+			x.trailer = t
+			t.xref = x
 
-			# Save to link them in next iteration
-			prevx = x
-			if t: prevt = t
+			# Next xref is located here (if zero then no more)
+			if 'Prev' in t.dictionary:
+				#print('jump to prev')
+				offset = t.dictionary['Prev']
+			else:
+				offset = t.startxref.offset
 
-			#print(['x', x, prevx])
-			#print(['t', t, prevt])
-			#print(['offset', offset])
+		else:
+			raise TypeError("Unrecognized xref object type: %s" % x)
 
-			# If there's only one xref/trailer combo then this could lead to recursively looping if this was not checked
-			if offset > 0 and offset in self.pdf.contents:
-				break
+		# Start reading the next section into the page cache in the background, it is likely to be wanted soon
+		if offset != 0 and offset not in self.xrefvisited:
+			self._Prefetch(offset, 65536)
 
-		# Now that all xrefs have been read, create the xref map to permit fast access
-		self.pdf.MakeXRefMap()
+		# Sections are read newest first, so map objects as they are read rather than in a second pass over every xref
+		self.pdf.AddXRefToMap(x)
 
-		# Could return self.pdf but I don't see the need at this point (keep it interal)
-		#return self.pdf
-		pass
+		# Link this xref/trailer combo to previous combo
+		x.next = prevx
+		if t: t.next = prevt
+
+		# Need to set root xref section in PDF object (this means prevx has not been set yet, so it is None)
+		if prevx == None:
+			self.pdf.rootxref = x
+
+		# Link previous xref/trailer combo to this combo
+		if prevx != None:	prevx.prev = x
+		if t != None and prevt != None:	prevt.prev = t
+
+		# Save to link them when the next section is read
+		self.xrefprev = x
+		if t: self.trailerprev = t
+
+		#print(['x', x, prevx])
+		#print(['t', t, prevt])
+		#print(['offset', offset])
+
+		return offset
+
+	def _Prefetch(self, offset, length):
+		"""
+		Hints that @length bytes at @offset will be read soon, if the file object supports it.
+		"""
+
+		if hasattr(self.file, 'willneed'):
+			self.file.willneed(offset, length)
+
+	def _PrefetchObjects(self, inds):
+		"""
+		Hints that the objects referenced by the IndirectObjects in @inds will be loaded soon, so the OS can read them all
+		concurrently rather than one at a time as each is loaded.
+		Objects already loaded or within object streams are skipped.
+		"""
+
+		if not hasattr(self.file, 'willneed'):
+			return
 
+		objmap = self.pdf.objmap
+		objcache = self.pdf.objcache
+		for ind in inds:
+			if not isinstance(ind, _pdf.IndirectObject) or ((ind.objid << 16) | ind.generation) in objcache:
+				continue
 
+			entry = objmap.get(ind.objid)
+			if entry != None and type(entry[0]) == int:
+				self.file.willneed(entry[0], 65536)
 
 	def ParseHeader(self, offset):
 		"""
@@ -196,29 +362,44 @@ class PDFTokenizer:
 		# The \x bytes are to convince FTP programs that it's binary
 		# The X.X is the version, so tease that out of that nastyness
 
-		line = self.file.readline()
-		line = line.decode('latin-1')
-		parts = line.split()
-		if not parts[0].startswith('%PDF-'):
+		# Header is a handful of bytes so read a fixed block instead of scanning for the end of the line
+		# Checked as bytes, only the version itself is decoded
+		buf = self.file.read(16)
+		if not buf.startswith(b'%PDF-'):
 			raise ValueError("File does not begin with %PDF and therefore is not a PDF")
 
-		# Split "%PDF-X.X" to ["%PDF", "X.X"]
-		parts = parts[0].split('-')
+		# Version runs from after "%PDF-" to the end-of-line (or whitespace)
+		parts = buf[5:].split(None, 1)
 
 		h = _pdf.Header()
-		h.version = parts[1]
+		h.version = parts[0].decode('latin-1') if len(parts) else ''
 		return h
 
 	def ParseXRef(self, offset):
 		"""
 		Parses an xref section into a pdf.XRef object that represents all of the objectid to offset maps.
+		Sections are cached by offset, so a section reached again (eg, through a shared /Prev) is not read twice.
 		"""
 
+		# Already parsed, leave the file where parsing would have
+		if offset in self.xrefcache:
+			self.cachestats['xref'][0] += 1
+			x,pos = self.xrefcache[offset]
+			self.file.seek(pos)
+			return x
+
+		self.cachestats['xref'][1] += 1
+		x = self._ParseXRef(offset)
+		self.xrefcache[offset] = (x, self.file.tell())
+
+		return x
+
+	def _ParseXRef(self, offset):
 		# Jump to trailer
 		self.file.seek(offset)
 
-		# Read first line to check if it's an xref stream
-		line = self.file.readline().decode('latin-1').strip()
+		# Read the start of the section to check if it's an xref stream (compared as bytes, no decoding or lexing)
+		head = self.file.read(64)
 
 		# Regardless, go back to start
 		# 1) If it's an xref stream then _LoadObject needs to start fromt he object definition (i.e., "INT INT obj")
@@ -226,9 +407,9 @@ class PDFTokenizer:
 		self.file.seek(offset)
 
 		# Check if found an object definition (i.e., "INT INT obj")
-		toks = pdfloc.TokenizeString(line)
-		if len(toks) == 3 and toks[0].type == 'INT' and toks[1].type == 'INT' and toks[2].type == 'obj':
-			objidgen = (toks[0].value, toks[1].value)
+		m = _OBJ_HEADER.match(head)
+		if m != None:
+			objidgen = (int(m.group(1)), int(m.group(2)))
 
 			return self.ParseXRef_stream(offset, objidgen)
 
@@ -248,29 +429,25 @@ class PDFTokenizer:
 		return self._ParseXRefStream(objidgen, toks)
 
 	def ParseXRef_plaintext(self, offset):
-		# Move to proper offset
-		self.file.seek(offset)
-
-		# Iterate backward until "trailer" is found then stop
-		lines = []
-		while True:
-			preoffset = self.file.tell()
-			line = self.file.readline()
-			if not len(line):
-				raise ValueError("Reached end-of-file before xref was read")
+		# Read up to "trailer" in one go and leave the file there for ParseTrailer
+		dat,end = self._ReadUntil(offset, b'trailer')
+		if end == -1:
+			raise ValueError("Reached end-of-file before xref was read")
 
-			line = line.decode('latin-1').rstrip()
-			#print(['line', line])
+		self.file.seek(offset + end)
 
-			if line.startswith("trailer"):
-				self.file.seek(preoffset)
-				break
+		# Whole section as one slice, which is split in C rather than read a line at a time
+		dat = dat[:end]
 
-			# Append if not "trailer"
-			lines.append(line)
+		# Fixed-width rows can be split directly without running them through the lexer
+		cols = pdfloc.ScanXRef(dat)
+		if cols != None:
+			x = _pdf.XRef()
+			x.offsets = _pdf.XRefRows.FromColumns(*cols)
+			return x
 
-		# Convert trailer to tokens
-		toks = pdfloc.TokenizeString("\r\n".join(lines))
+		# Convert xref to tokens
+		toks = pdfloc.TokenizeString(dat.decode('latin-1'))
 		toks = pdfloc.ConsolidateTokens(toks)
 
 		# Convert tokens to python objects
@@ -279,31 +456,88 @@ class PDFTokenizer:
 	def ParseTrailer(self, offset):
 		"""
 		Parses a trailer section into a pdf.Trailer object that represents the trailer dictionary and startxref offset.
+		Trailers are cached by offset the same as xref sections.
 		"""
 
-		# Jump to trailer
-		self.file.seek(offset)
+		# Already parsed, leave the file where parsing would have
+		if offset in self.trailercache:
+			self.cachestats['trailer'][0] += 1
+			t,pos = self.trailercache[offset]
+			self.file.seek(pos)
+			return t
 
-		# Iterate until %%EOF indicating end of trailer
-		lines = []
-		while True:
-			line = self.file.readline()
-			if not len(line):
-				raise ValueError("Reached end-of-file before trailer was read")
+		self.cachestats['trailer'][1] += 1
 
-			line = line.decode('latin-1').rstrip()
-			#print(['line', line])
-			lines.append(line)
+		# Read until %%EOF indicating end of trailer
+		dat,end = self._ReadUntil(offset, b'%%EOF')
+		if end == -1:
+			raise ValueError("Reached end-of-file before trailer was read")
 
-			if line == "%%EOF":
-				break
+		end += 5
+		self.file.seek(offset + end)
 
-		# Convert trailer to tokens
-		toks = pdfloc.TokenizeString("\r\n".join(lines))
-		toks = pdfloc.ConsolidateTokens(toks)
+		# Decoded through a memoryview so the slice itself is not copied first
+		txt = str(memoryview(dat)[:end], 'latin-1')
 
-		# Convert tokens to python objects
-		return TokenHelpers.Convert_Trailer(toks)
+		# Convert straight from the lexer for the common case
+		t = TokenHelpers.Convert_TrailerText(txt)
+		if t == None:
+			# Convert trailer to tokens
+			toks = pdfloc.TokenizeString(txt)
+			toks = pdfloc.ConsolidateTokens(toks)
+
+			# Convert tokens to python objects
+			t = TokenHelpers.Convert_Trailer(toks)
+
+		self.trailercache[offset] = (t, self.file.tell())
+
+		return t
+
+	def CacheInfo(self):
+		"""
+		Returns a dictionary of cache name to (hits, misses, size) for the xref and trailer caches.
+		"""
+
+		return {
+			'xref': (self.cachestats['xref'][0], self.cachestats['xref'][1], len(self.xrefcache)),
+			'trailer': (self.cachestats['trailer'][0], self.cachestats['trailer'][1], len(self.trailercache)),
+		}
+
+	def _ReadUntil(self, offset, keyword):
+		"""
+		Reads bytes from @offset in growing blocks until @keyword is found.
+		Returns tuple of (bytes read, index of keyword) where the index is -1 if the file ended first.
+		The bytes are a bytearray when the file is not mapped.
+		"""
+
+		# Mapped file can be searched in place and sliced once
+		m = getattr(self.file, 'm', None)
+		if m != None:
+			idx = m.find(keyword, offset)
+			if idx == -1:
+				return (m[offset:], -1)
+
+			return (m[offset:idx + len(keyword)], idx - offset)
+
+		self.file.seek(offset)
+
+		# Grown in place rather than building a new bytes object for every block
+		dat = bytearray()
+		size = 4096
+		pos = 0
+		while True:
+			chunk = self.file.read(size)
+			if not len(chunk):
+				return (dat, -1)
+
+			dat += chunk
+			idx = dat.find(keyword, pos)
+			if idx != -1:
+				return (dat, idx)
+
+			# Keyword may straddle blocks
+			pos = max(0, len(dat) - len(keyword) + 1)
+			size *= 2
 
 
 
@@ -317,13 +551,24 @@ class PDFTokenizer:
 		if isinstance(objid, _pdf.IndirectObject):
 			objid = (objid.objid, objid.generation)
 
-		if objid not in self.pdf.objmap:
+		# Map only holds the newest generation of each object
+		# NB: this is one probe on an int key per object loaded (GetObject caches above this), which is nothing next to
+		#  tokenizing the object, so there is no separate flat offset array for generation zero
+		entry = self.pdf.objmap.get(objid[0])
+
+		# Not in the xref sections read so far, so read older ones until it turns up or the chain ends
+		while entry == None and self._ReadNextXRef():
+			entry = self.pdf.objmap.get(objid[0])
+
+		if entry == None or entry[1] != objid[1]:
 			raise ValueError("Object %d (generation %d) not found in file" % (objid[0], objid[1]))
 
 		# Get offset and seek to it
-		offset = self.pdf.objmap[objid]
+		offset = entry[0]
 		#print('--------- LOAD OBJECT %s (offset %s) ----------' % (objid, offset))
 		if type(offset) == int:
+			# Let the OS start reading ahead of the first block in case the object is large
+			self._Prefetch(offset, 65536)
 			self.file.seek(offset)
 
 			# All this does is read from offset until the end of the object
@@ -355,26 +600,53 @@ class PDFTokenizer:
 
 		# Set object ID
 		if isinstance(o, _pdf.PDFBase):
-			o.oid = _pdf.IndirectObject()
-			o.oid.objid = objid[0]
-			o.oid.generation = objid[1]
+			o.oid = _pdf.IndirectObject.Make(objid[0], objid[1])
 
 		# Return processed token stream
 		return o
 
 	def _LoadObject(self):
-		# FIXME: I don't like this solution but it worse for now since I haven't hit objects larger than 768 kB
-		# Read a block and tokenize it
-		dat = self.file.read(768*1024).decode('latin-1')
+		# Read only as far as the first "endobj" instead of a fixed size block, growing the block if the object turns out to be bigger
+		offset = self.file.tell()
+		dat = self._ReadObjectText(offset, '', 0)
 
 		# Stop at endobj token
 		# Handle streams by catching the exception, processing for the length and then recalling on second iteration of the loop
 		streamlength = None
+		# Tokens before the "stream" keyword and its position, so the second iteration lexes only from there
+		resume = None
 		while True:
 			try:
-				toks = pdfloc.TokenizeString(dat, stoptoken="endobj", streamlength=streamlength)
-				break
+				if resume == None:
+					# Most objects have no stream, so first try lexing without going through the lexer a token at a time
+					toks = pdfloc.TokenizeStringFast(dat, stoptoken="endobj")
+					if toks == None:
+						toks = pdfloc.TokenizeString(dat, stoptoken="endobj", streamlength=streamlength)
+				else:
+					toks = pdfloc.TokenizeString(dat, pos=resume[1], stoptoken="endobj", streamlength=streamlength, tokens=list(resume[0]))
+
+				# The text stops at the first "endobj" in the bytes, which need not be the keyword (eg, a name like /endobjBar)
+				# Lexing then runs out before an endobj token, so read on to the next "endobj" and lex again
+				if len(toks) and toks[-1].type == 'endobj':
+					break
+
+				more = self._ReadObjectText(offset, dat, len(dat))
+				if len(more) == len(dat):
+					# End of file, so this is all there is
+					break
+				dat = more
+
+			except IndexError:
+				# Ran off the end of the block (eg, "endobj" inside a literal string) so read more and try again
+				more = self._ReadObjectText(offset, dat, len(dat))
+				if len(more) == len(dat):
+					raise
+				dat = more
 			except pdfloc.NeedStreamLegnthError as e:
+				# Lexer is sitting just past the "stream" keyword
+				streampos = pdfloc.lexer.lexpos
+				resume = (e.tokens[:], e.lexpos)
+
 				# Have to terminate object or consolidator will complain (important that e.tokens won't be used elsewhere since it is being modified)
 				t = pdfloc.plylex.LexToken()
 				t.type = 'endobj'
@@ -409,10 +681,61 @@ class PDFTokenizer:
 				else:
 					raise TypeError("Unknown type for stream length: %s" % dlen)
 
+				# Make sure the stream data and the endobj after it are in the block
+				# Stream size is known now so hint the whole remaining range before reading it
+				if streampos + streamlength > len(dat):
+					self._Prefetch(offset + len(dat), streampos + streamlength - len(dat) + 64)
+				dat = self._ReadObjectText(offset, dat, streampos + streamlength)
+
 				# At this point, streamlength should be set and iterating around the loop will find a successful TokenizeString call
 
 		return toks
 
+	def _ReadObjectText(self, offset, dat, after):
+		"""
+		Extends @dat, text already read from @offset, until "endobj" appears at or after index @after or the file ends.
+		Returns text only up to the end of that "endobj" so nothing past the object is decoded or lexed.
+		Bytes are searched before decoding and decoded as latin-1 so string indices map 1:1 to file offsets.
+
+		NB: this finds the bytes "endobj", not the keyword, so they may be inside a name or a literal string.
+		_LoadObject lexes the text and calls this again with @after at the end of @dat until the lexer reaches an endobj token.
+		"""
+
+		# Already have it
+		idx = dat.find('endobj', after)
+		if idx != -1:
+			return dat[:idx+6]
+
+		start = offset + len(dat)
+		pos = max(0, after - len(dat))
+
+		# Mapped file can be searched in place and decoded straight out of the map, so the object's bytes are never copied
+		m = getattr(self.file, 'm', None)
+		if m != None:
+			idx = m.find(b'endobj', start + pos)
+			end = len(m) if idx == -1 else idx + 6
+			return dat + str(memoryview(m)[start:end], 'latin-1')
+
+		# Read bytes following @dat in growing blocks
+		# Accumulated in place in one bytearray rather than building a new bytes object for every block
+		# First block is small since most objects are a few hundred bytes, doubling from there for big ones
+		raw = bytearray()
+		size = max(4096, len(dat))
+		while True:
+			self.file.seek(start + len(raw))
+			chunk = self.file.read(size)
+			if not len(chunk):
+				return dat + raw.decode('latin-1')
+
+			raw += chunk
+			idx = raw.find(b'endobj', pos)
+			if idx != -1:
+				return dat + str(memoryview(raw)[:idx+6], 'latin-1')
+
+			# Only need to search the new bytes next time (minus a partial keyword at the end)
+			pos = max(pos, len(raw) - 5)
+			size *= 2
+
 	def GetObject(self, objid, handler=None):
 		"""
 		Pull an object from the cache or load it if it's not loaded yet.
@@ -421,18 +744,29 @@ class PDFTokenizer:
 
 		#print('--------- GET OBJECT %s ----------' % (objid,))
 
+		# Same reference object as a recent call
+		hot = self.hotobjects
+		for h in hot:
+			if h[0] is objid:
+				return h[1]
+
 		if isinstance(objid, _pdf.IndirectObject):
-			k = (objid.objid, objid.generation)
+			# Packed into one int so there is no tuple to build and hash on every call
+			k = (objid.objid << 16) | objid.generation
+			objcache = self.pdf.objcache
 
-			# Check the cache first
-			if k in self.pdf.contents:
-				return self.pdf.contents[k]
+			# Check the cache first with a single lookup
+			# Compared against a sentinel so an object that parsed to None is cached too rather than reloaded every time
+			o = objcache.get(k, _MISS)
+			if o is _MISS:
+				# Load object
+				o = self.LoadObject(objid, handler)
 
-			# Load object
-			o = self.LoadObject(objid, handler)
+				# Store in cache
+				objcache[k] = o
 
-			# Store in cache
-			self.pdf.contents[k] = o
+			hot.insert(0, (objid, o))
+			del hot[self.HOTOBJECTS_SIZE:]
 
 			# Return object
 			return o
@@ -443,31 +777,40 @@ class PDFTokenizer:
 	def FindRootObject(self):
 		"""
 		Iterates through xref/trailer combos until the /Root (X X R) is found indicating the root object of the document.
+		The result is kept on the PDF object so the chain is only walked once.
 		"""
 
+		if self.pdf.rootind != None:
+			return self.pdf.rootind
+
+		self.pdf.rootind = self._FindRootObject()
+		return self.pdf.rootind
+
+	def _FindRootObject(self):
+		# Start at the newest section: an incremental update's /Root overrides older ones, so the first hit is the answer
 		x = self.pdf.rootxref
 
-		while x != None:
-			if isinstance(x, _pdf.XRef):
-				#print(['hi', x])
-				#print(x.trailer)
-				#print(x.trailer.dictionary)
-				if 'Root' in x.trailer.dictionary:
-					#print('root')
-					# This should be an indirect
-					return x.trailer.dictionary['Root']
-				else:
-					x = x.prev
-				#print('not root')
+		# Initialize only links sections it has not seen before, but guard against a cycle anyway since this would never end
+		seen = set()
+		while x != None and id(x) not in seen:
+			seen.add(id(x))
 
+			if isinstance(x, _pdf.XRef):
+				d = x.trailer.dictionary
 			elif isinstance(x, _pdf.XRefStream):
-				#print(['hib', x])
-				if 'Root' in x.Dict:
-					return x.Dict['Root']
-
+				d = x.Dict
 			else:
 				raise TypeError("Unknown xref object type: %s" % x)
 
+			if 'Root' in d:
+				# This should be an indirect
+				return d['Root']
+
+			# Both kinds of section move on to the previous one, reading it first if it has not been read yet
+			if x.prev == None:
+				self._ReadNextXRef()
+			x = x.prev
+
 		#print('return none')
 		return None
 
@@ -578,7 +921,9 @@ class PDFTokenizer:
 		else:
 			raise TypeError("Unrecognized type for array parsing: '%s'" % tokens[0])
 
-	def _ParseInt(self, objidgen, tokens):
+	@staticmethod
+	def _ParseInt(objidgen, tokens):
+		# Static as nothing here needs self: self._ParseInt is then the plain function and no bound method is made per stream length
 		# Example
 		# tokens =							[LexToken(OBJECT,(5, 0, [LexToken(INT,5312,1,8)]),1,4)]
 		# tokens[0] =						LexToken(OBJECT,(5, 0, [LexToken(INT,5312,1,8)]),1,4)
@@ -618,21 +963,20 @@ class PDFTokenizer:
 		"""
 
 		if tokens[0].type == 'OBJECT':
-			o = TokenHelpers.Convert(tokens[0].value[2][0])
+			d = TokenHelpers.Convert_DictAttributes(tokens[0].value[2][0])
 		elif tokens[0].type == 'DICT':
-			o = TokenHelpers.Convert(tokens[0])
+			d = TokenHelpers.Convert_DictAttributes(tokens[0])
 		else:
 			raise TypeError("Unrecognized type for stupid object parser; need dictionary got: '%s'" % tokens[0].type)
 
-		typ = o['Type']
+		typ = d['Type']
 
-		if typ == 'Pages':		r = _pdf.PageTreeNode(self._DynamicLoader)
-		elif typ == 'Page':		r = _pdf.Page(self._DynamicLoader)
-		else:
+		klass = _PAGE_CLASSES.get(typ)
+		if klass == None:
 			raise ValueError("Unrecognized object type (%s) for this function: neither Pages nor Page" % typ)
 
-		for k in o:
-			setattr(r, '_' + k, o[k])
+		r = klass(self._DynamicLoader)
+		_SetRawAttributes(r, d)
 
 		return r
 
@@ -644,21 +988,7 @@ class PDFTokenizer:
 		Several subtypes of ColorSpace, must switch depending on Subtype
 		"""
 
-		raise NotImplementedError()
-		#print(tokens)
-		o = TokenHelpers.Convert(tokens[0].value[2])
-		#print(o)
-		typ = o[0]['Subtype']
-
-		if styp == 'CalGray':	r = _pdf.ColorSpaceGray(self._DynamicLoader)
-		elif styp == 'CalRGB':	r = _pdf.ColorSpaceRGB(self._DynamicLoader)
-		else:
-			raise ValueError("Unrecognized object subtype (%s) for this type ColorSpace" % styp)
-
-		for k in o[0]:
-			setattr(r, '_' + k, o[0][k])
-
-		return r
+		raise NotImplementedError("ColorSpace objects are not implemented yet: %s" % (objidgen,))
 
 	def _ParseGraphicsState(self, objidgen, tokens):
 		return self._StupidObjectParser(objidgen, tokens, _pdf.GraphicsState)
@@ -669,26 +999,21 @@ class PDFTokenizer:
 		"""
 
 		if tokens[0].type == 'OBJECT':
-			o = TokenHelpers.Convert(tokens[0].value[2][0])
+			d = TokenHelpers.Convert_DictAttributes(tokens[0].value[2][0])
 		elif tokens[0].type == 'DICT':
-			o = TokenHelpers.Convert(tokens[0])
+			d = TokenHelpers.Convert_DictAttributes(tokens[0])
 		else:
 			raise TypeError("Unrecognized type for stupid object parser; need dictionary got: '%s'" % tokens[0].type)
 
-		typ = o['Type']
-		styp = o['Subtype']
+		typ = d['Type']
+		styp = d['Subtype']
 
-		if styp == 'Type0':				r = _pdf.Font0(self._DynamicLoader)
-		elif styp == 'Type1':			r = _pdf.Font1(self._DynamicLoader)
-		elif styp == 'Type3':			r = _pdf.Font3(self._DynamicLoader)
-		elif styp == 'TrueType':		r = _pdf.FontTrue(self._DynamicLoader)
-		elif styp == 'CIDFontType0':	r = _pdf.FontCID0(self._DynamicLoader)
-		elif styp == 'CIDFontType2':	r = _pdf.FontCID2(self._DynamicLoader)
-		else:
+		klass = _FONT_CLASSES.get(styp)
+		if klass == None:
 			raise ValueError("Unrecognized object type (%s) for this function: neither Type1,  Type3, or TrueType" % styp)
 
-		for k in o:
-			setattr(r, '_' + k, o[k])
+		r = klass(self._DynamicLoader)
+		_SetRawAttributes(r, d)
 
 		return r
 
@@ -720,13 +1045,12 @@ class PDFTokenizer:
 		else:						typ = 'XObject'
 		styp = d['Subtype']
 
-		if styp == 'Form':			r = _pdf.XObjectForm(self._DynamicLoader)
-		elif styp == 'Image':		r = _pdf.XObjectImage(self._DynamicLoader)
-		else:
+		klass = _XOBJECT_CLASSES.get(styp)
+		if klass == None:
 			raise ValueError("Unrecognized object type (%s) for this function: neither Form or Image" % styp)
 
-		for k in d:
-			setattr(r, '_' + k, d[k])
+		r = klass(self._DynamicLoader)
+		_SetRawAttributes(r, d.dictionary)
 
 		r.Dict = d
 		r.StreamRaw = s
@@ -742,15 +1066,15 @@ class PDFTokenizer:
 		"""
 
 		if tokens[0].type == 'OBJECT':
-			o = TokenHelpers.Convert(tokens[0].value[2][0])
+			tok = tokens[0].value[2][0]
 		elif tokens[0].type == 'DICT':
-			o = TokenHelpers.Convert(tokens[0])
+			tok = tokens[0]
 		else:
 			raise TypeError("Unrecognized type for stupid object parser; need dictionary got: '%s'" % tokens[0].type)
 
+		# Attributes are set straight from the tokens without building a pdf.Dictionary in between
 		r = klass(self._DynamicLoader)
-		for k in o:
-			setattr(r, '_' + k, o[k])
+		_SetRawAttributes(r, TokenHelpers.Convert_DictAttributes(tok))
 
 		return r
 
@@ -761,151 +1085,178 @@ class PDFTokenizer:
 		if key == 'Type':			return value
 		if key == 'Subtype':		return value
 
-		if klass == _pdf.Catalog:
-			if key == 'Pages':
-				# Catalog.Pages is a PageTreeNode
-				return self.GetPageTreeNode(value)
-			elif key == 'PageLabels':
-				return self.GetNumberTreeNode(value)
-
-		elif klass == _pdf.PageTreeNode:
-			if key == 'Kids':
-				# PageTreeNode is an array of PageTreeNode and Page
+		# Keys that always load the same way for the class
+		getters = _DYNAMIC_KEY_GETTERS.get(klass)
+		if getters != None:
+			getter = getters.get(key)
+			if getter != None:
+				return getter(self, value)
+
+		# Look up the loader for the class rather than testing each class in turn
+		loader = _DYNAMIC_LOADERS.get(klass)
+		if loader != None:
+			return loader(self, obj, key, value)
+
+		return self._DynamicLoaderMissing(obj, key, value)
+
+	def _DynamicLoaderMissing(self, obj, key, value):
+		raise NotImplementedError("Dynamic loader for class '%s' and key '%s' not implemented" % (obj.__class__.__name__, key))
+
+	def _DynamicLoader_PageTreeNode(self, obj, key, value):
+		if key == 'Kids':
+			# PageTreeNode is an array of PageTreeNode and Page
+			self._PrefetchObjects(value.array)
+			ret = []
+			for v in value.array:
+				ret.append( self.GetPageTreeNodeOrPage(v) )
+			return ret
+
+		return self._DynamicLoaderMissing(obj, key, value)
+
+	def _DynamicLoader_Page(self, obj, key, value):
+		# Set literal is folded into a constant frozenset, so this is one hash probe rather than comparing against each name
+		if key in {'MediaBox', 'CropBox', 'BleedBox', 'TrimBox', 'ArtBox'}:
+			if not isinstance(value, _pdf.IndirectObject):
+				return value
+		elif key == 'Contents':
+			if isinstance(value, _pdf.Array):
+				self._PrefetchObjects(value.array)
 				ret = []
 				for v in value.array:
-					ret.append( self.GetPageTreeNodeOrPage(v) )
+					ret.append( self.GetContent(v) )
 				return ret
-			elif key == 'Count':
-				return value
-
-		elif klass == _pdf.Page:
-			if key == 'Parent':
-				return self.GetPageTreeNode(value)
-			elif key in ('MediaBox', 'CropBox', 'BleedBox', 'TrimBox', 'ArtBox'):
-				if not isinstance(value, _pdf.IndirectObject):
-					return value
-			elif key == 'Contents':
-				if isinstance(value, _pdf.Array):
-					ret = []
-					for v in value.array:
-						ret.append( self.GetContent(v) )
-					return ret
-				elif isinstance(value, _pdf.IndirectObject):
-					return self.GetContentOrArray(value)
-				else:
-					raise TypeError("Unrecognized type for Page.Contents: %s" % type(value))
-			elif key == 'Resources':
-				if isinstance(value, _pdf.Dictionary):
-					r = _pdf.Resource(self._DynamicLoader)
-					for k in value:
-						setattr(r, '_' + k, value[k])
-					return r
-				elif isinstance(value, _pdf.IndirectObject):
-					return self.GetResource(value)
-
-		elif klass == _pdf.NumberTreeNode:
-			if key == 'Nums':
-				ret = []
-				for i in range(0, len(value.array), 2):
-					ret.append( tuple(value.array[i:i+2]) )
-				print(ret)
-				raise NotImplementedError()
-
-				return [self.GetNumberTreeNode(v) for v in value.array]
-
-
-		elif klass == _pdf.Resource:
-			if isinstance(value, _pdf.Dictionary) or isinstance(value, _pdf.Array):
-				return value
 			elif isinstance(value, _pdf.IndirectObject):
-				return self.GetDictionary(value)
-
-		elif klass == _pdf.Font0:
-			if isinstance(value, _pdf.IndirectObject):
-				if key == 'Encoding':
-					return self.GetFontEncoding(value)
-				elif key == 'ToUnicode':
-					return self.GetFontToUnicode(value)
-				elif key == 'DescendantFonts':
-					arr = self.GetArray(value)
-					r = []
-					for a in arr:
-						r.append( self.GetFont(a) )
-					return r
-
-				else:
-					pass
+				return self.GetContentOrArray(value)
 			else:
-				if key == 'DescendantFonts':
-					r = []
-					for a in value.array:
-						r.append( self.GetFont(a) )
-					return r
+				raise TypeError("Unrecognized type for Page.Contents: %s" % type(value))
+		elif key == 'Resources':
+			if isinstance(value, _pdf.Dictionary):
+				r = _pdf.Resource(self._DynamicLoader)
+				_SetRawAttributes(r, value.dictionary)
+				return r
+			elif isinstance(value, _pdf.IndirectObject):
+				return self.GetResource(value)
 
-				return value
+		return self._DynamicLoaderMissing(obj, key, value)
 
-		elif klass == _pdf.Font1 or klass == _pdf.FontTrue:
-			# Some of these may well be indirects but otherwise just return the value
-			if isinstance(value, _pdf.IndirectObject):
-				if key == 'FontDescriptor':
-					return self.GetFontDescriptor(value)
-				elif key == 'Encoding':
-					return self.GetFontEncoding(value)
-				elif key == 'ToUnicode':
-					return self.GetFontToUnicode(value)
-				elif key == 'Widths':
-					return self.GetFontWidths(value)
-				else:
-					pass
-			else:
-				return value
+	def _DynamicLoader_NumberTreeNode(self, obj, key, value):
+		if key == 'Nums':
+			raise NotImplementedError("Number tree node key 'Nums' not implemented yet")
 
-		elif klass == _pdf.Font3:
-			if key == 'FontDescriptor':
-				return self.GetFontDescriptor(value)
+		return self._DynamicLoaderMissing(obj, key, value)
 
-		elif klass in (_pdf.FontCID0, _pdf.FontCID2):
-			if isinstance(value, _pdf.IndirectObject):
-				if key == 'FontDescriptor':
-					return self.GetFontDescriptor(value)
-				elif key == 'W':
-					return self.GetArray(value)
-			else:
-				return value
+	def _DynamicLoader_Resource(self, obj, key, value):
+		if isinstance(value, _pdf.Dictionary) or isinstance(value, _pdf.Array):
+			return value
+		elif isinstance(value, _pdf.IndirectObject):
+			return self.GetDictionary(value)
 
-		elif klass == _pdf.FontDescriptor:
-			if key == 'FontFile3':
-				return self.GetFontFile3(value)
-			elif key == 'FontFile2':
-				return sefl.GetFontFile2(value)
+		return self._DynamicLoaderMissing(obj, key, value)
 
-		elif klass == _pdf.FontEncoding:
-			if isinstance(value, _pdf.IndirectObject):
-				pass
-			else:
-				return value
+	def _DynamicLoader_Font0(self, obj, key, value):
+		if isinstance(value, _pdf.IndirectObject):
+			if key == 'Encoding':
+				return self.GetFontEncoding(value)
+			elif key == 'ToUnicode':
+				return self.GetFontToUnicode(value)
+			elif key == 'DescendantFonts':
+				arr = self.GetArray(value)
+				r = []
+				for a in arr:
+					r.append( self.GetFont(a) )
+				return r
 
-		elif klass == _pdf.GraphicsState:
-			if isinstance(value, _pdf.IndirectObject):
-				pass
 			else:
-				return value
-
-		elif klass == _pdf.XObjectImage:
-			if isinstance(value, _pdf.IndirectObject):
 				pass
-			else:
-				return value
-
-		elif klass == _pdf.XObjectForm:
-			if isinstance(value, _pdf.IndirectObject):
-				if key == 'Resources':
-					return self.GetResource(value)
-			else:
-				return value
-
-		print(value)
-		raise NotImplementedError("Dynamic loader for class '%s' and key '%s' not implemented" % (klass.__name__, key))
+		else:
+			if key == 'DescendantFonts':
+				r = []
+				for a in value.array:
+					r.append( self.GetFont(a) )
+				return r
+
+			return value
+
+		return self._DynamicLoaderMissing(obj, key, value)
+
+	def _DynamicLoader_Indirect(self, obj, key, value):
+		# Direct values are returned as-is and indirects are loaded by the getter for the key, if the class has one
+		if isinstance(value, _pdf.IndirectObject):
+			getter = _DYNAMIC_INDIRECT_GETTERS[obj.__class__].get(key)
+			if getter != None:
+				return getter(self, value)
+		else:
+			return value
+
+		return self._DynamicLoaderMissing(obj, key, value)
+
+# Class to instantiate for each Type/Subtype, used by the PDFTokenizer._Parse* functions that switch on them
+_PAGE_CLASSES = {
+	'Pages': _pdf.PageTreeNode,
+	'Page': _pdf.Page,
+}
+_FONT_CLASSES = {
+	'Type0': _pdf.Font0,
+	'Type1': _pdf.Font1,
+	'Type3': _pdf.Font3,
+	'TrueType': _pdf.FontTrue,
+	'CIDFontType0': _pdf.FontCID0,
+	'CIDFontType2': _pdf.FontCID2,
+}
+_XOBJECT_CLASSES = {
+	'Form': _pdf.XObjectForm,
+	'Image': _pdf.XObjectImage,
+}
+
+# Getters for keys that load the same way regardless of value, keyed by class then key, used by PDFTokenizer._DynamicLoader
+_DYNAMIC_KEY_GETTERS = {
+	# Catalog.Pages is a PageTreeNode
+	_pdf.Catalog: {'Pages': PDFTokenizer.GetPageTreeNode, 'PageLabels': PDFTokenizer.GetNumberTreeNode},
+	_pdf.PageTreeNode: {'Count': lambda self, value: value},
+	_pdf.Page: {'Parent': PDFTokenizer.GetPageTreeNode},
+	_pdf.Font3: {'FontDescriptor': PDFTokenizer.GetFontDescriptor},
+	_pdf.FontDescriptor: {'FontFile3': PDFTokenizer.GetFontFile3, 'FontFile2': PDFTokenizer.GetFontFile2},
+}
+
+# Getters for indirect values keyed by class then key, used by PDFTokenizer._DynamicLoader_Indirect for classes that otherwise return direct values as-is
+# Classes with no getters only take direct values (FontEncoding, GraphicsState, XObjectImage)
+_FONT1_INDIRECT_GETTERS = {
+	'FontDescriptor': PDFTokenizer.GetFontDescriptor,
+	'Encoding': PDFTokenizer.GetFontEncoding,
+	'ToUnicode': PDFTokenizer.GetFontToUnicode,
+	'Widths': PDFTokenizer.GetFontWidths,
+}
+_FONTCID_INDIRECT_GETTERS = {
+	'FontDescriptor': PDFTokenizer.GetFontDescriptor,
+	'W': PDFTokenizer.GetArray,
+}
+_DYNAMIC_INDIRECT_GETTERS = {
+	_pdf.Font1: _FONT1_INDIRECT_GETTERS,
+	_pdf.FontTrue: _FONT1_INDIRECT_GETTERS,
+	_pdf.FontCID0: _FONTCID_INDIRECT_GETTERS,
+	_pdf.FontCID2: _FONTCID_INDIRECT_GETTERS,
+	_pdf.FontEncoding: {},
+	_pdf.GraphicsState: {},
+	_pdf.XObjectImage: {},
+	_pdf.XObjectForm: {'Resources': PDFTokenizer.GetResource},
+}
+
+# Dynamic loader for each class for everything else, used by PDFTokenizer._DynamicLoader
+_DYNAMIC_LOADERS = {
+	_pdf.PageTreeNode: PDFTokenizer._DynamicLoader_PageTreeNode,
+	_pdf.Page: PDFTokenizer._DynamicLoader_Page,
+	_pdf.NumberTreeNode: PDFTokenizer._DynamicLoader_NumberTreeNode,
+	_pdf.Resource: PDFTokenizer._DynamicLoader_Resource,
+	_pdf.Font0: PDFTokenizer._DynamicLoader_Font0,
+	_pdf.Font1: PDFTokenizer._DynamicLoader_Indirect,
+	_pdf.FontTrue: PDFTokenizer._DynamicLoader_Indirect,
+	_pdf.FontCID0: PDFTokenizer._DynamicLoader_Indirect,
+	_pdf.FontCID2: PDFTokenizer._DynamicLoader_Indirect,
+	_pdf.FontEncoding: PDFTokenizer._DynamicLoader_Indirect,
+	_pdf.GraphicsState: PDFTokenizer._DynamicLoader_Indirect,
+	_pdf.XObjectImage: PDFTokenizer._DynamicLoader_Indirect,
+	_pdf.XObjectForm: PDFTokenizer._DynamicLoader_Indirect,
+}
 
 class TextTokenizer:
 	"""
@@ -926,9 +1277,24 @@ class TextTokenizer:
 		self.file = file
 		self.pdf = pdf
 
+		# ToUnicode mappers keyed by id() of the font, as (font, mapper) so the font can't be freed and its id reused
+		self._cmap_cache = {}
+
 	def TokenizeString(self, txt):
 		return textloc.TokenizeString(txt)
 
+	def GetCMapper(self, fo):
+		"""
+		Gets the function that maps a character code to unicode from the ToUnicode CMap of font @fo.
+		Fonts are selected over and over again (Tf) so the mapper is built only once per font for this tokenizer.
+		"""
+
+		c = self._cmap_cache.get(id(fo))
+		if c == None:
+			c = self._cmap_cache[id(fo)] = (fo, CMapTokenizer().BuildMapper(fo.ToUnicode.Stream))
+
+		return c[1]
+
 class CMapTokenizer:
 	"""
 	Tokenizer for CMap programs.
@@ -941,88 +1307,73 @@ class CMapTokenizer:
 		return cmaploc.TokenizeString(txt)
 
 	def BuildMapper(self, txt):
+		"""
+		Builds a function that maps a character code to unicode from CMap text @txt.
+		See TextTokenizer.GetCMapper to build it once per font.
+		"""
+
 		toks = self.TokenizeString(txt)
 
 		# Final map data and range data (keys are ranges; value is starting unicode value)
 		mapdat = {}
 		rangedat = {}
 
+		# Walk the tokens once, collecting the values of each begin/end section and mapping them at its end
+		# A CMap can split a section into several blocks (at most 100 entries each), so every block is used, in file order
+		mode = None
 		codes = []
-
-		# Handle individual character mappings
-		mapon = False
 		for tok in toks:
-			if tok.type == 'beginbfchar':
-				mapon = True
-				continue
-			if mapon and tok.type == 'endbfchar':
-				mapon = False
-
-				# Make map
-				for i in range(0, len(codes), 2):
-					mapdat[ codes[i] ] = chr(codes[i+1])
-
-				break
-
-			if mapon:
-				if tok.type == 'CODE':
-					codes.append(tok.value)
-				else:
-					raise NotImplementedError("Unrecognized token: '%s'" % str(tok))
+			tt = tok.type
 
-		# Handle character range mappings
-		codes = []
-		mapon = False
-		for tok in toks:
-			if tok.type == 'beginbfrange':
-				mapon = True
+			if mode == None:
+				if tt == 'beginbfchar' or tt == 'beginbfrange' or tt == 'begincidrange':
+					mode = tt
+					codes = []
 				continue
-			if mapon and tok.type == 'endbfrange':
-				mapon = False
 
-				for i in range(0, len(codes), 3):
-					sindex = codes[i]
-					eindex = codes[i+1]
-					offset = codes[i+2]
+			if tt == 'CODE':
+				codes.append(tok.value)
 
-					for k in range(codes[i], codes[i+1]+1):
-						mapdat[k] = chr(offset + (k - codes[i]))
+			# Handle individual character mappings
+			elif mode == 'beginbfchar':
+				if tt != 'endbfchar':
+					raise NotImplementedError("Unrecognized token: '%s'" % str(tok))
 
-				break
+				# Make map (codes alternate character code and unicode value)
+				mapdat.update( zip(codes[0::2], map(chr, codes[1::2])) )
+				mode = None
 
-			if mapon:
-				if tok.type == 'CODE':
-					codes.append(tok.value)
-				elif tok.type == 'ARR':
+			# Handle character range mappings
+			elif mode == 'beginbfrange':
+				if tt == 'ARR':
 					raise NotImplementedError("Not setup to handle bf range arrays")
-				else:
+				elif tt != 'endbfrange':
 					raise NotImplementedError("Unrecognized token: '%s'" % str(tok))
 
-		# Handle cid range mappings
-		ranges = []
-		mapon = False
-		for tok in toks:
-			if tok.type == 'begincidrange':
-				mapon = True
-				continue
-			if mapon and tok.type == 'endcidrange':
-				mapon = False
-
-				for r in ranges:
-					rangedat[ (r[0],r[1]) ] = r[2]
-
-				break
+				# Codes are in threes: start code, end code, starting unicode value
+				for sindex,eindex,offset in zip(codes[0::3], codes[1::3], codes[2::3]):
+					# Expand the whole range in one update rather than a dictionary store per code
+					# (zip/range/map all run in C so there is no Python loop per code left to compile)
+					mapdat.update( zip(range(sindex, eindex+1), map(chr, range(offset, offset + eindex - sindex + 1))) )
+				mode = None
 
-			if mapon:
-				if tok.type == 'CODE':
-					ranges.append(tok.value)
-				elif tok.type == 'INT':
-					e = ranges.pop()
-					s = ranges.pop()
-					ranges.append( (s,e, tok.value) )
+			# Handle cid range mappings
+			else:
+				if tt == 'INT':
+					codes.append(tok.value)
+				elif tt == 'endcidrange':
+					# Values are in threes: start code, end code, starting CID
+					for r in zip(codes[0::3], codes[1::3], codes[2::3]):
+						rangedat[ (r[0],r[1]) ] = r[2]
+					mode = None
 				else:
 					raise NotImplementedError("Unrecognized token: '%s'" % str(tok))
 
+		# Ranges sorted by start code so the range holding a code is found by bisecting rather than testing each one
+		# (ranges in a CMap do not overlap, so the only candidate is the last one starting at or before the code)
+		spans = sorted( (r[0], r[1], unistart) for r,unistart in rangedat.items() )
+		starts = [sp[0] for sp in spans]
+
 		def mapper(c):
 			if type(c) == int:
 				cc = c
@@ -1031,12 +1382,15 @@ class CMapTokenizer:
 			else:
 				raise TypeError("Cannot map non-string: %s" % type(c))
 
-			if cc in mapdat:
-				return mapdat[cc]
+			# Single lookup for the common case of a directly mapped code
+			v = mapdat.get(cc)
+			if v != None:
+				return v
 
-			for r,unistart in rangedat.items():
-				s,e = r
-				if cc >= s and cc <= e:
+			i = bisect.bisect_right(starts, cc) - 1
+			if i >= 0:
+				s,e,unistart = spans[i]
+				if cc <= e:
 					# Find offset of code (@cc) from range start (@s), which is then added to the unicode starting value (@unistart)
 					diff = cc-s
 					return chr(unistart + diff)
@@ -1067,6 +1421,7 @@ class ObjectStreamTokenizer:
 	First = None
 	ObjectStream = None
 	Tokens = None
+	Ranges = None
 	Objects = None
 
 	def __init__(self, obj):
@@ -1074,6 +1429,7 @@ class ObjectStreamTokenizer:
 		self.N = obj.Dict['N']
 		self.First = obj.Dict['First']
 		self.Tokens = None # Delay processing until needed
+		self.Ranges = None
 		self.Objects = None
 
 	def Process(self):
@@ -1081,50 +1437,61 @@ class ObjectStreamTokenizer:
 		if self.Tokens != None:
 			return self.Tokens
 
-		self.Tokens = pdfloc.TokenizeString(self.ObjectStream.Stream)
+		# Object streams hold no streams themselves so the fast path nearly always applies
+		self.Tokens = pdfloc.TokenizeStringFast(self.ObjectStream.Stream)
+		if self.Tokens == None:
+			self.Tokens = pdfloc.TokenizeString(self.ObjectStream.Stream)
+
+		# (object id, first token, last token + 1) of each object, keyed by index in the stream
+		self.Ranges = {}
 
-		# Objects keyed by offset
+		# Objects keyed by index, consolidated by GetObjectTokens as they're asked for
 		self.Objects = {}
 
 		# Index objects by their offset in the stream
-		# 1) Pull out the integers that comprise the index of this object stream
-		indexes = self.Tokens[0:(self.N*2)]
-		# 2) Chunk the list of integers into pairs (first is object number; second is offset from self.First)
-		indexes = [ (indexes[i].value,indexes[i+1].value) for i in range(0,len(indexes),2) ]
-		# 3) Add a last placeholder with the full-length of the stream so that step (4) works correctly without running passed the end
-		indexes.append( (None, len(self.ObjectStream.Stream)) )
-		# 4) Basically remake list from (2) and include the ending offset for each object resulting in a list of (object id, (start offset, end offset))
-		indexes = [(indexes[i][0], (indexes[i][1],indexes[i+1][1]-1)) for i in range(len(indexes)-1)]
+		# 1) Pull out the integers that comprise the index of this object stream, which are pairs of object number and offset from self.First
+		vals = [_.value for _ in self.Tokens[0:(self.N*2)]]
+		oids = vals[0::2]
+		offs = vals[1::2]
+		# 2) Add a last placeholder with the full-length of the stream so that step (3) works correctly without running passed the end
+		offs.append(len(self.ObjectStream.Stream))
+		# 3) Make a list of (object id, start offset, end offset) where each object ends just before the next one starts
+		# Need to account for offset in which the object data begins (this is after the integer index plus whatever padding the creating app put in between)
+		first = self.First
+		indexes = [(oids[i], offs[i] + first, offs[i+1] + first - 1) for i in range(len(oids))]
+
+		# Lexer positions are increasing so each object's token range can be found by bisection rather than scanning every token per object
+		positions = [_.lexpos for _ in self.Tokens]
+		# Offsets are normally increasing as well, so each search starts where the previous object's tokens ended
+		hi = 0
+
+		# Unpack the structure created in (3) above
+		for i,(oid,startidx,endidx) in enumerate(indexes):
+			# Pull out the tokens whose lexer position is between the start and end indices
+			# The previous search is only a valid place to start if every token before it is before this object; otherwise
+			# (an offset out of order, which also leaves the previous object's end before its start) search the whole list again
+			lo = bisect.bisect_left(positions, startidx, hi if hi == 0 or positions[hi-1] < startidx else 0)
+			hi = bisect.bisect_right(positions, endidx, lo)
+
+			# Only the token range is kept; a stream can hold hundreds of objects and usually few of them are ever loaded
+			self.Ranges[i] = (oid, lo, hi)
 
-		for i in range(len(indexes)):
-			idx = indexes[i]
-
-			# Unpack the structure created in (4) above
-			oid, (startidx,endidx) = idx
-
-			# Need to account for offset in which the object data begins (this is after the integer index plus whatever padding the creating app put in between)
-			startidx += self.First
-			endidx += self.First
+	def GetObjectTokens(self, index):
+		if self.Objects == None:
+			self.Process()
 
-			# Iterate through entire token range to pull out the tokens whose lexer position is between the start and end indices
-			# NB: this is not all that efficient since the entire token list is iterated through for every object in the stream, however, functioning first and optimize later
-			toks = [ self.Tokens[_] for _ in range(len(self.Tokens)) if (self.Tokens[_].lexpos >= startidx and self.Tokens[_].lexpos <= endidx) ]
+		o = self.Objects.get(index)
+		if o == None:
+			oid,lo,hi = self.Ranges[index]
 
 			# Map array index to tuple of (object id, tokens)
 			# NB: object type is unknown at this point so no appropriate handler can/should be called,
 			# and since LoadObject is up the stack which does contain the appropriate handler then defer processing of tokens until that point
-			self.Objects[i] = (oid, pdfloc.ConsolidateTokens(toks))
-
-			#print([off, (startidx, endidx), toks, self.Objects[off]])
-			#print([off, (startidx, endidx), self.Objects[off]])
-
-	def GetObjectTokens(self, index):
-		if self.Objects == None:
-			self.Process()
+			o = self.Objects[index] = (oid, pdfloc.ConsolidateTokens(self.Tokens[lo:hi]))
 
 		# Returns the tokens corresponding to this object
 		# NB: the object id in [0] is ignored since the XRefRowCompressed has the object id that led to parsing the object stream
-		return self.Objects[index][1]
+		return o[1]
 
 class FontMetricsTokenizer:
 	def __init__(self, txt):
@@ -1132,148 +1499,234 @@ class FontMetricsTokenizer:
 
 		self.Comments = []
 
+		# The CharMetrics and KernPairs sections (including their start and end lines) are set aside by ParseHeader
+		# as text, or as tokens if they could only be found by lexing the whole file
+		self.CharMetricsTxt = None
+		self.CharMetricsTokens = None
+		self.KernPairsTxt = None
+		self.KernPairsTokens = None
+
+		# Results of ParseHeader, ParseCharMetrics and ParseKerning, which are only parsed once
+		self._Header = None
+		self._CharMetrics = None
+		self._Kerning = None
+
 	def Parse(self):
-		tokens = fmloc.TokenizeString(self.txt)
+		"""
+		Parses the entire file into a dictionary.
+		"""
 
-		tokens,charmetrics = cuttokens(tokens, 'StartCharMetrics', 'EndCharMetrics')
-		tokens,kerndata = cuttokens(tokens, 'StartKernData', 'EndKernData')
+		ret = self.ParseHeader()
+		ret['CharMetrics'],ret['Ligatures'] = self.ParseCharMetrics()
+		ret['Kerning'] = self.ParseKerning()
 
-		if kerndata != None:
-			kerndata,kernpairs = cuttokens(kerndata, 'StartKernPairs', 'EndKernPairs')
-		else:
-			kernpairs = None
+		return ret
+
+	def ParseHeader(self):
+		"""
+		Parses everything but the CharMetrics and KernPairs sections into a dictionary.
+		Those sections are set aside to be parsed by ParseCharMetrics and ParseKerning when needed.
+		Each call gets its own copy of the dictionary since callers (eg, Parse) add to it.
+		"""
 
+		if self._Header != None:
+			return dict(self._Header)
 
-		# Could do this, or block the for loop below under an if statement....
-		if kernpairs == None:
-			kernpairs = []
+		txt = self.txt
+
+		# The CharMetrics and KernPairs sections are the bulk of the file, so pull them out of the text without lexing them
+		txt,self.CharMetricsTxt = self._CutSection(txt, 'StartCharMetrics', 'EndCharMetrics')
+		txt,self.KernPairsTxt = self._CutSection(txt, 'StartKernPairs', 'EndKernPairs')
+
+		tokens = fmloc.TokenizeString(txt)
+
+		# Sections not found in the text are pulled out of the tokens instead
+		tokens,self.CharMetricsTokens = cuttokens(tokens, 'StartCharMetrics', 'EndCharMetrics')
+		tokens,kerndata = cuttokens(tokens, 'StartKernData', 'EndKernData')
+
+		if kerndata != None:
+			kerndata,self.KernPairsTokens = cuttokens(kerndata, 'StartKernPairs', 'EndKernPairs')
 
 		ret = {}
 		ret['Comments'] = []
-		ret['CharMetrics'] = {}
-		ret['Ligatures'] = []
-		ret['Kerning'] = {}
-		ret['Kerning']['Pairs'] = {}
 
 		# Everything leftover
+		keys = _FM_HEADER_KEYS
 		for tok in tokens:
-			if tok.type == 'StartFontMetrics':		ret['FMVersion'] = tok.value
-			elif tok.type == 'EndFontMetrics':		pass
-
-			elif tok.type == 'Ascender':			ret['Ascender'] = tok.value
-			elif tok.type == 'CapHeight':			ret['CapHeight'] = tok.value
-			elif tok.type == 'COMMENT':				ret['Comments'].append(tok.value)
-			elif tok.type == 'CharacterSet':		ret['CharacterSet'] = tok.value
-			elif tok.type == 'Descender':			ret['Descender'] = tok.value
-			elif tok.type == 'EncodingScheme':		ret['EncodingScheme'] = tok.value
-			elif tok.type == 'FontBBox':			ret['FontBBox'] = tok.value
-			elif tok.type == 'FontName':			ret['FontName'] = tok.value
-			elif tok.type == 'FullName':			ret['FullName'] = tok.value
-			elif tok.type == 'FamilyName':			ret['FamilyName'] = tok.value
-			elif tok.type == 'IsFixedPitch':		ret['IsFixedPitch'] = tok.value
-			elif tok.type == 'ItalicAngle':			ret['ItalicAngle'] = tok.value
-			elif tok.type == 'Notice':				ret['Notice'] = tok.value
-			elif tok.type == 'StdHW':				ret['StdHW'] = tok.value
-			elif tok.type == 'StdVW':				ret['StdVW'] = tok.value
-			elif tok.type == 'UnderlinePosition':	ret['UnderlinePosition'] = tok.value
-			elif tok.type == 'UnderlineThickness':	ret['UnderlineThickness'] = tok.value
-			elif tok.type == 'Version':				ret['Version'] = tok.value
-			elif tok.type == 'Weight':				ret['Weight'] = tok.value
-			elif tok.type == 'XHeight':				ret['XHeight'] = tok.value
+			tt = tok.type
+			k = keys.get(tt)
+			if k != None:							ret[k] = tok.value
+			elif tt == 'COMMENT':					ret['Comments'].append(tok.value)
+			elif tt == 'EndFontMetrics':			pass
 			else:
 				raise TypeError("Unrecognized token: '%s'" % tok)
 
+		self._Header = ret
+
+		return dict(ret)
+
+	def ParseCharMetrics(self):
+		"""
+		Parses the CharMetrics section set aside by ParseHeader.
+		Returns a 2-tuple of (character metrics dictionary indexed by character name, list of ligatures).
+		"""
+
+		if self._CharMetrics != None:
+			return self._CharMetrics
+
+		if self.CharMetricsTxt != None:
+			charmetrics = self._ScanSection(self.CharMetricsTxt, fmloc.ScanCharMetrics)
+		elif self.CharMetricsTokens != None:
+			charmetrics = self.CharMetricsTokens
+		else:
+			charmetrics = []
+
+		metrics = {}
+		ligatures = []
+
 		lastchar = None
 		curchar = {}
+		# Per-character tokens are tested first as they are nearly all of the section (ScanCharMetrics doesn't produce SemiColon)
 		for tok in charmetrics:
-			if tok.type == 'StartCharMetrics':		pass
-			elif tok.type == 'EndCharMetrics':		pass
-			elif tok.type == 'SemiColon':			pass
-
-			elif tok.type == 'C':
+			tt = tok.type
+			if tt == 'C':
 				if len(curchar):
-					ret['CharMetrics'][curchar['N']] = curchar
+					metrics[curchar['N']] = curchar
 					lastchar = curchar
 					curchar = {}
 
 				curchar['C'] = tok.value
-			elif tok.type == 'WX':					curchar['W'] = (tok.value, 0)
-			elif tok.type == 'N':					curchar['N'] = tok.value
-			elif tok.type == 'B':					curchar['B'] = tok.value
-			elif tok.type == 'L':
+			elif tt == 'WX':						curchar['W'] = (tok.value, 0)
+			elif tt == 'N':							curchar['N'] = tok.value
+			elif tt == 'B':							curchar['B'] = tok.value
+
+			elif tt == 'SemiColon':					pass
+			elif tt == 'StartCharMetrics':			pass
+			elif tt == 'EndCharMetrics':			pass
+
+			elif tt == 'L':
 				l = {}
 				l['base'] = lastchar
 				l['successor'] = tok.value[0]
 				l['ligature'] = tok.value[1]
-				ret['Ligatures'].append(l)
+				ligatures.append(l)
 
 			else:
 				raise TypeError("Unrecognized token: '%s'" % tok)
 
+		self._CharMetrics = (metrics, ligatures)
+
+		# Section is no longer needed
+		self.CharMetricsTxt = None
+		self.CharMetricsTokens = None
+
+		return self._CharMetrics
+
+	def ParseKerning(self):
+		"""
+		Parses the KernPairs section set aside by ParseHeader.
+		Returns the kerning dictionary with the pairs under 'Pairs'.
+		"""
+
+		if self._Kerning != None:
+			return self._Kerning
+
+		if self.KernPairsTxt != None:
+			kernpairs = self._ScanSection(self.KernPairsTxt, fmloc.ScanKernPairs)
+		elif self.KernPairsTokens != None:
+			kernpairs = self.KernPairsTokens
+		else:
+			kernpairs = []
+
+		kerning = {}
+		kerning['Pairs'] = {}
+
+		pairs = kerning['Pairs']
 		for tok in kernpairs:
-			if tok.type == 'StartKernPairs':		pass
-			elif tok.type == 'EndKernPairs':		pass
+			tt = tok.type
+			if tt == 'KPX':
+				pairs[tok.value[0]] =				(tok.value[1], 0)
 
-			elif tok.type == 'KPX':
-				ret['Kerning']['Pairs'][tok.value[0]] =		(tok.value[1], 0)
+			elif tt == 'StartKernPairs':			pass
+			elif tt == 'EndKernPairs':				pass
 			else:
 				raise TypeError("Unrecognized token: '%s'" % tok)
 
-		return ret
+		self._Kerning = kerning
+
+		# Section is no longer needed
+		self.KernPairsTxt = None
+		self.KernPairsTokens = None
+
+		return self._Kerning
+
+	@staticmethod
+	def _CutSection(txt, starttok, endtok):
+		"""
+		Finds the section of @txt delimited by lines starting with @starttok and @endtok.
+		Returns a 2-tuple of (@txt without the section, section text including the start and end lines),
+		or (@txt, None) if the section was not found.
+		"""
+
+		start = txt.find('\n' + starttok)
+		if start == -1:
+			return txt,None
+		start += 1
+
+		end = txt.find('\n' + endtok, start)
+		if end == -1:
+			return txt,None
+		end += 1 + len(endtok)
+
+		return txt[:start] + txt[end:], txt[start:end]
+
+	@staticmethod
+	def _ScanSection(txt, scanner):
+		"""
+		Scans the lines of section text @txt between the start and end lines with @scanner.
+		Falls back to lexing the section if the scanner cannot handle it.
+		"""
 
+		lines = txt.splitlines()
+
+		tokens = scanner("\n".join(lines[1:-1]))
+		if tokens == None:
+			tokens = fmloc.TokenizeString(txt)
+
+		return tokens
 
 class TokenHelpers:
 	@staticmethod
 	def Convert(tok):
-		# Handle a native list separately from below
-		if type(tok) == list:
-			return [TokenHelpers.Convert(p) for p in tok]
+		"""
+		Converts token @tok (or a list of tokens) into the corresponding pdf.py object or native value.
+		The converter is found with one lookup of the token type in _CONVERT_DISPATCH, so adding a token type means adding it there.
+		"""
 
+		try:
+			handler = _CONVERT_DISPATCH[tok.type]
+		except AttributeError:
+			# Handle a native list separately (checked only when there is no token type, rather than on every call)
+			if type(tok) == list:
+				return [TokenHelpers.Convert(p) for p in tok]
+			raise
+		except KeyError:
+			raise ValueError("Unknown token type '%s'" % tok.type)
 
 		#print(['tok', tok])
-		if tok.type in ('NAME', 'INT', 'FLOAT'):
-			return tok.value
-		elif tok.type == 'HEXSTRING':
-			o = _pdf.Hexstring()
-			o.string = tok.value
-			return o
-		elif tok.type == 'LIT':
-			return tok.value
-		elif tok.type == 'INDIRECT':
-			o = _pdf.IndirectObject()
-			o.objid = tok.value[0]
-			o.generation = tok.value[1]
-			return o
-		elif tok.type == 'ARR':
-			o = _pdf.Array()
-			o.array = [TokenHelpers.Convert(z) for z in tok.value]
-			return o
-		elif tok.type == 'DICT':
-			return TokenHelpers.Convert_Dictionary(tok)
-		elif tok.type == 'stream':
-			return tok.value
-		elif tok.type == 'true':
-			return True
-		elif tok.type == 'false':
-			return False
-		elif tok.type == 'NULL':
-			return None
-		else:
-			print(tok.value)
-			raise ValueError("Unknown token type '%s'" % tok.type)
+		return handler(tok)
 
 	@staticmethod
 	def Convert_XRef(toks):
 		x = _pdf.XRef()
-		x.offsets = []
 
-		for row in toks[0].value:
-			if row[3] == 'n':
-				me = _pdf.XRefRowUsed(objid=row[0], offset=row[1], generation=row[2])
-			else:
-				me = _pdf.XRefRowFree(objid=row[0], generation=row[2])
-
-			x.offsets.append(me)
+		# Transpose rows into columns and pack each in one go
+		rows = toks[0].value
+		if len(rows):
+			objids,offsets,gens,flags = zip(*rows)
+			x.offsets = _pdf.XRefRows.FromColumns(objids, offsets, gens, [f == 'n' for f in flags])
+		else:
+			x.offsets = _pdf.XRefRows()
 
 		return x
 
@@ -1287,20 +1740,138 @@ class TokenHelpers:
 		return t
 
 	@staticmethod
-	def Convert_Dictionary(toks):
-		ret = {}
+	def Convert_TrailerText(txt):
+		"""
+		Converts trailer text ("trailer << ... >> startxref INT %%EOF") into a pdf.Trailer object
+		as tokens come out of the lexer, without building token lists to consolidate and convert.
+		Returns None if anything is encountered that is not handled here (eg, literal strings) so the caller can fall back to the full path.
+		"""
 
-		for kv in toks.value:
-			k = kv[0]
-			v = kv[1]
+		lexer = pdfloc.lexer
+		lexer.input(txt)
 
-			ret[ TokenHelpers.Convert(k) ] = TokenHelpers.Convert(v)
+		tok = lexer.token()
+		if tok == None or tok.type != 'trailer':
+			return None
+
+		# Stack of open containers, each a list of converted values, with the type of container alongside
+		stack = []
+		kinds = []
+		top = None
+		d = None
+
+		while True:
+			tok = lexer.token()
+			if tok == None:
+				return None
+
+			tt = tok.type
+			if tt == 'COMMENT':
+				continue
+
+			if tt == 'DICT_START' or tt == 'ARR_START':
+				top = []
+				stack.append(top)
+				kinds.append(tt)
+				continue
+
+			if top == None:
+				return None
+
+			if tt == 'DICT_END' or tt == 'ARR_END':
+				kind = kinds.pop()
+				items = stack.pop()
+
+				if tt == 'DICT_END':
+					if kind != 'DICT_START' or len(items) % 2:
+						return None
+
+					v = _pdf.Dictionary()
+					v.dictionary = dict(zip(items[0::2], items[1::2]))
+				else:
+					if kind != 'ARR_START':
+						return None
+
+					v = _pdf.Array()
+					v.array = items
+
+				if not len(stack):
+					# Outermost dictionary is the trailer dictionary
+					d = v
+					break
+
+				top = stack[-1]
+				top.append(v)
+
+			elif tt == 'indirect':
+				# "INT INT R" so replace the two integers just added with the reference
+				if len(top) < 2 or type(top[-1]) != int or type(top[-2]) != int:
+					return None
+
+				gen = top.pop()
+				top.append(_pdf.IndirectObject.Make(top.pop(), gen))
+
+			elif tt == 'NAME':
+				# Already interned by the lexer
+				top.append(tok.value)
+			elif tt == 'INT' or tt == 'FLOAT':
+				top.append(tok.value)
+			elif tt == 'HEXSTRING':
+				top.append(_ConvertHexstring(tok))
+			elif tt == 'true':
+				top.append(True)
+			elif tt == 'false':
+				top.append(False)
+			elif tt == 'NULL':
+				top.append(None)
+			else:
+				return None
+
+		if not isinstance(d, _pdf.Dictionary):
+			return None
+
+		# Remaining is "startxref INT %%EOF", which only needs the integer pulled out
+		m = _TRAILER_STARTXREF.match(lexer.lexdata, lexer.lexpos)
+		if m == None:
+			return None
+
+		t = _pdf.Trailer()
+		t.dictionary = d
+		t.startxref = _pdf.StartXRef()
+		t.startxref.offset = int(m.group(1))
+
+		return t
+
+	@staticmethod
+	def Convert_Dictionary(toks):
+		# Keys are converted now, values only when accessed
+		# Keys are (almost) always names, whose value is already the interned key, so skip Convert for those
+		conv = TokenHelpers.Convert
+		raw = {(kv[0].value if kv[0].type == 'NAME' else conv(kv[0])): kv[1] for kv in toks.value}
 
 		d = _pdf.Dictionary()
-		d.dictionary = ret
+		d.SetRaw(raw, TokenHelpers.Convert)
 
 		return d
 
+	@staticmethod
+	def Convert_DictAttributes(tok):
+		"""
+		Converts DICT token @tok into a python dictionary with every value converted, ready for _SetRawAttributes.
+		Unlike Convert_Dictionary, no pdf.Dictionary is made since the values are all wanted at once.
+		"""
+
+		if tok.type != 'DICT':
+			raise TypeError("Expected dictionary token, got '%s'" % tok.type)
+
+		conv = TokenHelpers.Convert
+
+		# Keys first so a repeated key keeps only its last value, as in a dictionary
+		# Name keys are taken straight from the token (see Convert_Dictionary)
+		raw = {(kv[0].value if kv[0].type == 'NAME' else conv(kv[0])): kv[1] for kv in tok.value}
+
+		return {k: conv(v) for k,v in raw.items()}
+
 	@staticmethod
 	def Convert_StartXRef(toks):
 		s = _pdf.StartXRef()
@@ -1308,3 +1879,65 @@ class TokenHelpers:
 
 		return s
 
+
+# Handlers for TokenHelpers.Convert keyed by token type (dict lookup instead of an elif chain)
+
+def _ConvertValue(tok):
+	return tok.value
+
+def _ConvertHexstring(tok):
+	return _pdf.Hexstring.Make(tok.value)
+
+def _ConvertIndirect(tok):
+	return _pdf.IndirectObject.Make(tok.value[0], tok.value[1])
+
+def _ConvertArray(tok):
+	# Nested arrays are built with an explicit stack of (list being filled, remaining tokens) rather than
+	# recursing through Convert, so deeply nested arrays cost no Python frames
+	# (dictionary values are converted lazily so they never recurse here)
+	# Element handlers are called directly rather than through Convert, which is only needed for its errors and native lists
+	conv = TokenHelpers.Convert
+	dispatch = _CONVERT_DISPATCH
+	o = _pdf.Array()
+	o.array = []
+	stack = [(o.array, iter(tok.value))]
+	while len(stack):
+		out,it = stack[-1]
+		for z in it:
+			if type(z) == list:
+				out.append(conv(z))
+				continue
+
+			t = z.type
+			if t == 'ARR':
+				a = _pdf.Array()
+				a.array = []
+				out.append(a)
+				stack.append( (a.array, iter(z.value)) )
+				break
+
+			handler = dispatch.get(t)
+			if handler == None:
+				out.append(conv(z))
+			else:
+				out.append(handler(z))
+		else:
+			stack.pop()
+
+	return o
+
+_CONVERT_DISPATCH = {
+	# Names are interned by the lexer, so the value is used as-is
+	'NAME': _ConvertValue,
+	'INT': _ConvertValue,
+	'FLOAT': _ConvertValue,
+	'HEXSTRING': _ConvertHexstring,
+	'LIT': _ConvertValue,
+	'INDIRECT': _ConvertIndirect,
+	'ARR': _ConvertArray,
+	'DICT': TokenHelpers.Convert_Dictionary,
+	'stream': _ConvertValue,
+	'true': lambda tok: True,
+	'false': lambda tok: False,
+	'NULL': lambda tok: None,
+}
@@ -97,7 +97,6 @@ def t_NAME(t):
 	return t
 
 def t_error(t):
-	print([t])
 	raise Exception("Bad character ord='%d' on line %d" % (ord(t.value[0]), t.lexer.lineno))
 
 def t_WS(t):
@@ -315,7 +315,6 @@ def t_INT(t):
 	return t
 
 def t_error(t):
-	print([t])
 	raise Exception("Bad character ord='%d' on line %d" % (ord(t.value[0]), t.lexer.lineno))
 
 def t_WS(t):
@@ -345,3 +344,68 @@ def TokenizeString(dat):
 
 	return tokens
 
+
+class ScanToken:
+	"""
+	Minimal stand-in for a lexer token (type and value only) produced by the line scanners below.
+	"""
+
+	__slots__ = ('type', 'value')
+
+	def __init__(self, type, value):
+		self.type = type
+		self.value = value
+
+	def __repr__(self):
+		return "ScanToken(%s,%r)" % (self.type, self.value)
+
+def ScanCharMetrics(dat):
+	"""
+	Scans the body of a CharMetrics section (the lines between StartCharMetrics and EndCharMetrics).
+	Each line is a sequence of "KEY value ;" entries so it is split rather than lexed, producing the
+	same token types and values as TokenizeString would (less the SemiColon tokens).
+
+	Returns None if a key is encountered that is not handled here so the caller can fall back to TokenizeString.
+	"""
+
+	tokens = []
+
+	for line in dat.splitlines():
+		for part in line.split(';'):
+			part = part.strip()
+			if not len(part):
+				continue
+
+			k,_,v = part.partition(' ')
+
+			if k == 'C':			tokens.append( ScanToken('C', intorfloat(v)) )
+			elif k == 'WX':			tokens.append( ScanToken('WX', intorfloat(v)) )
+			elif k == 'N':			tokens.append( ScanToken('N', v.strip()) )
+			elif k == 'B':			tokens.append( ScanToken('B', [int(p) for p in v.split()]) )
+			elif k == 'L':			tokens.append( ScanToken('L', v.split()) )
+			else:
+				return None
+
+	return tokens
+
+def ScanKernPairs(dat):
+	"""
+	Scans the body of a KernPairs section (the lines between StartKernPairs and EndKernPairs).
+	Produces the same KPX tokens as TokenizeString would.
+
+	Returns None if a line is encountered that is not handled here so the caller can fall back to TokenizeString.
+	"""
+
+	tokens = []
+
+	for line in dat.splitlines():
+		parts = line.split()
+		if not len(parts):
+			continue
+
+		if parts[0] != 'KPX' or len(parts) != 4:
+			return None
+
+		tokens.append( ScanToken('KPX', ((parts[1],parts[2]), int(parts[3]))) )
+
+	return tokens
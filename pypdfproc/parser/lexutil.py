@@ -0,0 +1,18 @@
+"""
+Helpers shared by the PLY lexers in this package.
+"""
+
+import sys
+
+def InternTokenTypes(lexer):
+	"""
+	Interns the token type names of PLY lexer @lexer.
+	PLY slices token types out of the rule names so they are not interned, which makes comparing tok.type against a string
+	literal a character compare rather than an identity check.
+	"""
+
+	for ritems in lexer.lexstatere.values():
+		for cre,findex in ritems:
+			for i,f in enumerate(findex):
+				if f != None and f[1] != None:
+					findex[i] = (f[0], sys.intern(f[1]))
@@ -2,8 +2,12 @@
 Tokenizer and parser for the Carousel object system that makes up the PDF file.
 """
 
+import re, sys
+
 import ply.lex as plylex
 
+from .lexutil import InternTokenTypes
+
 tokens = (
 	'EOF',
 	'FLOAT',
@@ -20,7 +24,6 @@ tokens = (
 
 	'NAME',
 	'HEXSTRING',
-	'WS',
 
 	'true',
 	'false',
@@ -89,7 +92,8 @@ def t_NAME(t):
 	r'/[^\(\)\<\>\[\]\/ \t\r\n]+'
 
 	# Ignore slash (not formally a part of the name)
-	t.value = t.value[1:]
+	# Interned here, once, as names are dictionary keys and compared against literals constantly after conversion
+	t.value = sys.intern(t.value[1:])
 	return t
 
 def t_HEXSTRING(t):
@@ -100,55 +104,71 @@ def t_HEXSTRING(t):
 	return t
 
 def t_error(t):
-	print([t])
 	raise Exception("Bad character ord='%d' on line %d" % (ord(t.value[0]), t.lexer.lineno))
 
-def t_WS(t):
-	r'[\t \r\n]+'
-
-	# Ignore these tokens by returning None
-	return None
-
-# Ignore nothing, whitespace is handled above
-t_ignore = ''
+# Whitespace is skipped by the lexer itself rather than matched as a rule and discarded by a callback
+t_ignore = '\t \r\n'
 
 # Initiate lexer
 lexer = plylex.lex()
+InternTokenTypes(lexer)
 
+# Parentheses that may open or close a literal string
+_LIT_PAREN = re.compile(r'[()]')
 
 class NeedStreamLegnthError(Exception):
 	tokens = None
 
-	def __init__(self, message, tokens):
+	# Position of the "stream" keyword, where TokenizeString can resume once the length is known
+	lexpos = None
+
+	def __init__(self, message, tokens, lexpos=None):
 		Exception.__init__(self, message)
 		self.tokens = tokens
+		self.lexpos = lexpos
 
-def TokenizeString(dat, pos=None, stoptoken=None, streamlength=None):
+def TokenizeString(dat, pos=None, stoptoken=None, streamlength=None, tokens=None):
 	"""
 	NB: if @dat is a fixed size block of text then any step here may run into
 	a "IndexError: string index out of range" exception being thrown. It may be very puzzling since
 	the document should be well-formed, but ensure that this isn't the problem first before hunting
 	down other explanations.
+
+	NB: @dat must be str (PDF bytes decoded as latin-1), not bytes. The rules are str regexes that PLY joins into one
+	master pattern, and stream values sliced out of lexdata become StreamRaw, which the rest of the package treats as str.
+	Callers decode only the object's own bytes, straight out of the mmap or read buffer through a memoryview.
+
+	If @tokens is provided then tokens are appended to it, so that lexing can resume at @pos after tokens already lexed
+	(eg, at NeedStreamLegnthError.lexpos with a copy of NeedStreamLegnthError.tokens) without lexing them again.
 	"""
 
-	tokens = []
+	if tokens == None:
+		tokens = []
 
 	lexer.input(dat)
 	# lexer assumes it always starts at zero, which is wrong when parsing random objects in PDF files
 	if pos != None:
 		lexer.lexpos = pos
 
-	tokcnt = 0
+	# Stop token is checked against every token so decide once whether there is one
+	if type(stoptoken) != str:
+		stoptoken = None
+
+	# Bound once since these run for every token
+	token = lexer.token
+	append = tokens.append
 	while True:
-		tok = lexer.token()
+		tok = token()
 		#print(tok)
 		if not tok: break
 
+		tt = tok.type
+
 		# Special handling by yanking out streamlength bytes from the stream token
-		if tok.type == 'stream':
+		if tt == 'stream':
 			# No length provided so bail and provide tokens thus far to permit re-calling lexer with streamlength
 			if streamlength == None:
-				raise NeedStreamLegnthError("Ran into a stream without a stream length, cannot process stream", tokens)
+				raise NeedStreamLegnthError("Ran into a stream without a stream length, cannot process stream", tokens, tok.lexpos)
 
 			# Leading CRLF
 			if lexer.lexdata[lexer.lexpos] == '\r':
@@ -170,23 +190,16 @@ def TokenizeString(dat, pos=None, stoptoken=None, streamlength=None):
 
 
 		# Special handling by yanking out literal text because balanced parenthesis is hard in regex
-		if tok.type == 'LIT_START':
-			cnt = 1
-
+		elif tt == 'LIT_START':
 			# Keep track so to know indices of literal string
 			startpos = lexer.lexpos
 
-			while cnt>0:
-				if lexer.lexdata[lexer.lexpos] == '(' and lexer.lexdata[lexer.lexpos-1] != '\\':
-					cnt += 1
-				elif lexer.lexdata[lexer.lexpos] == ')' and lexer.lexdata[lexer.lexpos-1] != '\\':
-					cnt -= 1
-
-				# Make a step
-				lexer.lexpos += 1
+			endpos = _ScanLiteral(lexer.lexdata, startpos)
+			if endpos == None:
+				# Same as running off the end of a fixed size block (see NB above)
+				raise IndexError("string index out of range")
 
-			# Save some typing
-			endpos = lexer.lexpos
+			lexer.lexpos = endpos
 
 			# Yank out literal data excluding the last byte since that is the LIT_END
 			tok.type = 'LIT'
@@ -200,25 +213,280 @@ def TokenizeString(dat, pos=None, stoptoken=None, streamlength=None):
 			#lexer.lexpos -= 1
 
 		# Record token (after potentially modifying it above)
-		tokens.append(tok)
+		append(tok)
+
+		# Type as recorded (ie, after LIT_START becomes LIT)
+		if tok.type == stoptoken:
+			break
+
+	return tokens
+
+def _ScanLiteral(lexdata, startpos):
+	"""
+	Finds the end of the literal string whose text starts at @startpos in @lexdata (ie, just after the opening parenthesis).
+	Returns the position just past the closing parenthesis, or None if the literal string is not closed in @lexdata.
+	"""
+
+	cnt = 1
+
+	# Jump between parentheses rather than stepping through every character
+	endpos = startpos
+	while cnt>0:
+		m = _LIT_PAREN.search(lexdata, endpos)
+		if m == None:
+			return None
+
+		i = m.start()
+		if lexdata[i-1] != '\\':
+			if lexdata[i] == '(':
+				cnt += 1
+			else:
+				cnt -= 1
+
+		# Make a step
+		endpos = i + 1
+
+	return endpos
+
+# The lexer's own master pattern (so tokens are chosen exactly as lexer.token() would) preceded by the ignored whitespace,
+# and the (rule function, token type) for each group of it, see TokenizeStringFast
+_FAST_RE = re.compile(r'[\t\r\n\x20]*(?:' + lexer.lexstatere['INITIAL'][0][0].pattern + ')', lexer.lexstatere['INITIAL'][0][0].flags)
+_FAST_INDEX = lexer.lexstatere['INITIAL'][0][1]
+_FAST_WS = re.compile(r'[\t\r\n ]*')
+
+def TokenizeStringFast(dat, stoptoken=None):
+	"""
+	Same tokens as TokenizeString(@dat, stoptoken=@stoptoken), but matching the lexer's pattern directly rather than going
+	through lexer.token(), which skips whitespace a character at a time and builds each token attribute by attribute.
+	Returns None if it runs into a stream, an unterminated literal string or a character the lexer rejects, so the caller can
+	use TokenizeString which handles (or reports) those.
+	"""
+
+	tokens = []
 
-		# Count token
-		tokcnt += 1
+	# A @stoptoken that is not a str never stops the loop, as in TokenizeString
+	if type(stoptoken) != str:
+		stoptoken = None
 
-		if type(stoptoken) == str:
-			if tok.type == stoptoken:
+	# The pattern, its group table and the token class are used for every token
+	match = _FAST_RE.match
+	index = _FAST_INDEX
+	append = tokens.append
+	LexToken = plylex.LexToken
+	lineno = lexer.lineno
+
+	pos = 0
+	while True:
+		m = match(dat, pos)
+		if m == None:
+			# End of the data, or something only TokenizeString knows what to do with
+			if _FAST_WS.match(dat, pos).end() == len(dat):
 				break
-		else:
-			pass
+			return None
+
+		i = m.lastindex
+		func,tt = index[i]
+
+		tok = LexToken()
+		tok.type = tt
+		tok.value = m.group(i)
+		tok.lineno = lineno
+		tok.lexpos = m.start(i)
+		pos = m.end()
+
+		if func != None:
+			tok = func(tok)
+
+		elif tt == 'stream':
+			# Needs the stream length
+			return None
+
+		elif tt == 'LIT_START':
+			endpos = _ScanLiteral(dat, pos)
+			if endpos == None:
+				return None
+
+			# Same as TokenizeString
+			tok.type = 'LIT'
+			tok.value = dat[pos:(endpos-1)].replace("\\(", "(").replace("\\)", ")")
+			pos = endpos
+
+		append(tok)
+
+		if tok.type == stoptoken:
+			break
 
 	return tokens
 
+# Maps xref row flags to in-use values: 'n' to 1, anything else ('f') to 0
+_XREF_INUSE = bytes(1 if _ == ord('n') else 0 for _ in range(256))
+
+def ScanXRef(dat):
+	"""
+	Scans a plaintext xref section (bytes from "xref" up to, but excluding, "trailer") without the lexer.
+	Rows are fixed-width so splitting on whitespace is all that is needed, and each column of a subsection is taken by slicing.
+	Returns a tuple of columns (object numbers, offsets, generations, in use flags as bytes of 0/1) covering every subsection.
+
+	Returns None if anything unexpected is encountered so the caller can fall back to TokenizeString.
+	"""
+
+	# NB: rows are normally exactly 20 bytes, but slicing each field at its fixed position from Python
+	# is slower than one bytes.split plus map(int) over the column slices, so there is no fixed-width special case
+	parts = dat.split()
+	if not len(parts) or parts[0] != b'xref':
+		return None
+
+	objids = []
+	offsets = []
+	gens = []
+	flags = []
+
+	i = 1
+	cnt = len(parts)
+	try:
+		while i < cnt:
+			# Subsection header: first object number and number of rows
+			firstobj = int(parts[i])
+			numobjs = int(parts[i+1])
+			i += 2
+
+			end = i + numobjs*3
+			if end > cnt:
+				return None
+
+			objids.extend(range(firstobj, firstobj + numobjs))
+			offsets.extend(map(int, parts[i:end:3]))
+			gens.extend(map(int, parts[i+1:end:3]))
+			flags.extend(parts[i+2:end:3])
+			i = end
+
+	except ValueError:
+		return None
+
+	# Every flag must be a single 'n' or 'f'
+	flags = b''.join(flags)
+	if len(flags) != len(objids) or len(flags.translate(None, b'nf')):
+		return None
+
+	return (objids, offsets, gens, flags.translate(_XREF_INUSE))
+
 # Provide function in this file to shortcut the class static method
 def ConsolidateTokens(tokens):
 	"""
 	Consolidate tokens as logically appropriate for the tokens given (dictionary, array, etc.).
+	Well-formed object tokens are consolidated in a single pass by _ConsolidateTokens, anything else (xref and trailer
+	sections, unbalanced brackets) goes through the pass-per-construct ConsolidateTokensClass.ConsolidateTokens.
+	"""
+
+	ret = _ConsolidateTokens(tokens)
+	if ret == None:
+		return ConsolidateTokensClass.ConsolidateTokens(tokens)
+	return ret
+
+def _MakeToken(typ, value, lineno, lexpos):
+	tok = plylex.LexToken()
+	tok.type = typ
+	tok.value = value
+	tok.lineno = lineno
+	tok.lexpos = lexpos
+	return tok
+
+def _ConsolidateTokens(tokens):
+	"""
+	Same result as ConsolidateTokensClass.ConsolidateTokens but in one pass over @tokens, rather than one pass per construct
+	with arrays consolidated again from scratch, by keeping a stack of the arrays, dictionaries and objects being filled.
+	Input tokens are not modified.
+	Returns None for anything it does not handle identically (xref, trailer, unbalanced brackets) so the caller can fall back.
+	"""
+
+	# Kind of the innermost open construct (None at the top level, else 'ARR', 'DICT' or 'OBJECT')
+	# Each stack entry is the (kind, output list, opening token(s)) of an enclosing construct
+	kind = None
+	out = ret = []
+	stack = []
+
+	for tok in tokens:
+		tt = tok.type
+
+		if tt == 'indirect':
+			# "INT INT R" is an indirect reference
+			if len(out) >= 2 and out[-1].type == 'INT' and out[-2].type == 'INT':
+				gen = out.pop()
+				objid = out.pop()
+				out.append( _MakeToken('INDIRECT', (objid.value, gen.value, tok.value), objid.lineno, objid.lexpos) )
+			else:
+				out.append(tok)
+
+		elif tt == 'ARR_START' or tt == 'DICT_START':
+			stack.append( (kind, out, tok) )
+			kind = tt[:-6]
+			out = []
+
+		elif tt == 'ARR_END':
+			if kind != 'ARR':
+				return None
+
+			kind,parent,start = stack.pop()
+			parent.append( _MakeToken('ARR', _StripEndstream(out), start.lineno, start.lexpos) )
+			out = parent
+
+		elif tt == 'DICT_END':
+			if kind != 'DICT':
+				return None
+
+			# Key without a value gets a null value
+			if len(out) % 2 != 0:
+				out.append( _MakeToken('NULL', None, out[-1].lineno, out[-1].lexpos) )
+
+			kind,parent,start = stack.pop()
+			parent.append( _MakeToken('DICT', list(zip(out[0::2], out[1::2])), start.lineno, start.lexpos) )
+			out = parent
+
+		# Only references, arrays and dictionaries are consolidated inside a dictionary; stream and object passes never look inside one
+		elif kind == 'DICT':
+			if tt == 'xref' or tt == 'trailer':
+				return None
+			out.append(tok)
+
+		elif tt == 'obj' and kind != 'OBJECT' and len(out) >= 2 and (out[-1].type == 'endstream' or out[-2].type == 'endstream'):
+			# Passes strip endstream before matching objects, so "INT endstream INT obj" is an object; leave it to them
+			return None
+
+		elif tt == 'obj' and kind != 'OBJECT' and len(out) >= 2 and out[-1].type == 'INT' and out[-2].type == 'INT':
+			# "INT INT obj" starts an object that runs to endobj
+			gen = out.pop()
+			objnum = out.pop()
+			stack.append( (kind, out, (objnum, gen, tok)) )
+			kind = 'OBJECT'
+			out = []
+
+		elif tt == 'endobj' and kind == 'OBJECT':
+			kind,parent,start = stack.pop()
+			parent.append( _MakeToken('OBJECT', (start[0].value, start[1].value, _StripEndstream(out)), start[2].lineno, start[2].lexpos) )
+			out = parent
+
+		elif tt == 'xref' or tt == 'trailer':
+			return None
+
+		else:
+			out.append(tok)
+
+	# Something was left open
+	if len(stack):
+		return None
+
+	return _StripEndstream(ret)
+
+def _StripEndstream(toks):
 	"""
-	return ConsolidateTokensClass.ConsolidateTokens(tokens)
+	Strip out endstream tokens. They are kept in place while consolidating so that "INT endstream INT R" is not taken as a
+	reference, same as the indirect pass running before the stream pass.
+	"""
+
+	for tok in toks:
+		if tok.type == 'endstream':
+			return [tok for tok in toks if tok.type != 'endstream']
+	return toks
 
 class ConsolidateTokensClass:
 	"""
@@ -361,7 +629,7 @@ class ConsolidateTokensClass:
 			(ret,x) = ConsolidateTokensClass.Dictionary(toks, i, len(toks)-1)
 
 			# Add tokens to processed list
-			nexttoks = nexttoks + ret
+			nexttoks.extend(ret)
 
 			# Go to next indicated token
 			i = x + 1
@@ -479,8 +747,8 @@ def TokenIterator(tokens, startpos, endpos, func):
 		# Call function on token
 		z,ii = func(tokens, i, endpos)
 
-		# Add returned tokens to the resultant list
-		ret = ret + z
+		# Add returned tokens to the resultant list (extended in place, a new list each time is quadratic)
+		ret.extend(z)
 		# Jump to specified end index (which is incremented next)
 		i = ii
 
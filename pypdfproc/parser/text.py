@@ -2,8 +2,12 @@
 Text stream parser of content streams that contain the rendering instructions for text and graphics
 """
 
+import sys
+
 import ply.lex as plylex
 
+from .lexutil import InternTokenTypes
+
 tokens = (
 	'FLOAT',
 	'INT',
@@ -215,7 +219,8 @@ def t_NAME(t):
 	r'/[^\(\)\<\>\[\]\/ \t\r\n]+'
 
 	# Ignore slash (not formally a part of the name)
-	t.value = t.value[1:]
+	# Interned as the same few font and resource names are used as dictionary keys for every glyph drawn
+	t.value = sys.intern(t.value[1:])
 	return t
 
 def t_HEXSTRING(t):
@@ -226,7 +231,6 @@ def t_HEXSTRING(t):
 	return t
 
 def t_error(t):
-	print([t])
 	raise Exception("Bad character ord='%d' on line %d" % (ord(t.value[0]), t.lexer.lineno))
 
 def t_WS(t):
@@ -242,6 +246,7 @@ t_ignore = ''
 
 # Initiate lexer
 lexer = plylex.lex()
+InternTokenTypes(lexer)
 
 class PDFToken(object):
 	"""
@@ -274,7 +279,6 @@ def TokenizeString(txt, residual=None):
 	lexer.input(txt)
 
 	tokens = []
-	tokcnt = 0
 
 	# Start the tokens list with the residual
 	if type(residual) == list:
@@ -284,9 +288,13 @@ def TokenizeString(txt, residual=None):
 	else:
 		raise TypeError("Residual expected to be a list, got %s" % type(residual))
 
+	# Content streams run to thousands of tokens, so the lexer's token method and the list's append are looked up once
+	token = lexer.token
+	append = tokens.append
+
 	# Parse text stream into tokens
 	while True:
-		tok = lexer.token()
+		tok = token()
 		if not tok:
 			break
 
@@ -332,8 +340,7 @@ def TokenizeString(txt, residual=None):
 			# Go back a space so the lexer pulls out the LIT_END token
 			#lexer.lexpos -= 1
 
-		tokcnt += 1
-		tokens.append(tok)
+		append(tok)
 
 	# I'm sure they had a good reason, but the tokens are "postfixed" in the sense that the operator comes after the operand
 	# which makes linear parsing one step harder
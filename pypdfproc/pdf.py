@@ -4,7 +4,7 @@ No references to underlying parsing is made.
 """
 
 # System libs
-import struct, zlib
+import array, struct, zlib
 
 # Local files
 from .decoder import Decoder
@@ -15,20 +15,33 @@ class PDF:
 	"""
 
 	# Object map permits direct access to reading objects in the file
-	# Keyed by (objid, generation) tuples and value is integer offset within the file
+	# Keyed by integer objid and value is (location, generation) where location is the integer offset within the file
 	objmap = None
 	# Contents of the file, indexed by offset within file with the value being one
 	# of the classes contained within this file
 	contents = None
+	# Objects loaded through GetObject, keyed by the single integer (objid << 16) | generation (generation is at most 65535)
+	# Kept apart from contents so object keys can't collide with file offsets
+	objcache = None
 
 	# Root xref in the file
+	# NB: the parser reads older xref sections along the /Prev chain only as they are needed, so until xrefloader has been
+	#  called the chain from here (and objmap) may hold only the newest sections
 	rootxref = None
 
+	# Callable, set by the parser, that reads every xref section not read yet; None if there is nothing to read
+	xrefloader = None
+
+	# Indirect reference to the root (catalog) object once found, the xref chain does not change after being read
+	rootind = None
+
 	def __init__(self):
 		self.objmap = {}
 		self.contents = {}
 		self.objcache = {}
 		self.rootxref = None
+		self.xrefloader = None
+		self.rootind = None
 
 	def MakeOrderedContents(self):
 		"""
@@ -51,114 +64,189 @@ class PDF:
 	def MakeXRefMap(self):
 		"""
 		Makes the xref map that is self.objmap.
-		Keys the self.objmap by (objid, generation) tuples with value of the integer offset within the file.
+		Keys the self.objmap by integer objid with value of (integer offset within the file, generation).
 
 		This follows the xref/trailer chain throughout the file and keeps the "newest" version of each object,
 		meaning that this correctly handles incremental updates to objects.
+		PDFTokenizer builds the same map with AddXRefToMap as it reads each xref instead of calling this.
+		It reads older sections only when needed, so any it has not read yet are read first through self.xrefloader.
 		"""
 
-		# Object map maps a (object id, generation) tuple to the offset within the file
-		# If the value is a tuple then it's a reference to an object within an object stream and
-		#  the structure of the tuple is ( (stream id, generation), offset ) where offset is within
-		#  that object stream
+		if self.xrefloader != None:
+			self.xrefloader()
+
 		self.objmap = {}
 
-		# Pull out first xref/trailer combo
+		# Iterate until no more xref/trailer combos, starting with the newest
 		x = self.rootxref
-		t = x.trailer
-
-		# Iterate until no more xref/trailer combos
 		while x != None:
-			if isinstance(x, XRef):
-				# Iterate through offsets in xref and make map to objects
-				for me in x.offsets:
-					# Ignore if object is marked free
-					if me.__class__ == XRefRowFree:
-						continue
-
-					# Key to index offset by
-					p = (me.objid, me.generation)
-					if p in self.objmap:
-						# Already exists which means the me.offset is the old object and self.objmap[p] is the newer object
-						pass
-					else:
-						# Object not mapped yet so map it to the offset
-						self.objmap[p] = me.offset
-
-				# Jump to next xref/trailer combo (last one will set x to None and stop iteration)
-				x = x.prev
-				t = t.prev
-
-			elif isinstance(x, XRefStream):
-				for me in x.StreamRows:
-
-					if isinstance(me, XRefRowFree):
-						# Nothing to do
-						continue
-
-					elif isinstance(me, XRefRowUsed):
-						p = (me.objid, me.generation)
-						if p in self.objmap:
-							# Already exists which means the me.offset is the old object and self.objmap[p] is the newer object
-							pass
-						else:
-							# Object not mapped yet so map it to the offset
-							self.objmap[p] = me.offset
-
-					elif isinstance(me, XRefRowCompressed):
-						p = IndirectObject()
-						p.objid = me.objstreamid
-						p.generation = 0
-
-						k = (me.objid,0)
-
-						if k in self.objmap:
-							# Already exists which means the me.offset is the old object and self.objmap[k] is the newer object
-							pass
-						else:
-							# Object not mapped yet so map it to the offset
-
-							# Tuple indicates object stream reference
-							# Object stream is (me.objstreamid,0) as generation zero is assumed
-							# The offset is within the object stream
-							self.objmap[k] = ( p, me.objstreamoffset)
+			self.AddXRefToMap(x)
+			x = x.prev
 
-					else:
-						raise TypeError("Unrecognized xref object type: %s" % me)
+	def AddXRefToMap(self, x):
+		"""
+		Adds the objects in xref section @x to self.objmap, skipping any that are already mapped.
+		Sections must be added newest first so that the newest version of each object is kept.
+		"""
 
-				x = x.prev
-				t = None
+		# Object map maps an object id to a tuple of (location, generation) where location is the offset within the file
+		# Only the newest generation of an object is reachable so keying by object id alone is sufficient
+		# If the location is a tuple then it's a reference to an object within an object stream and
+		#  the structure of the tuple is ( (stream id, generation), offset ) where offset is within
+		#  that object stream
+		# NB: a plain dict is kept on purpose; a sorted packed array searched with bisect would use less memory
+		#  for huge xrefs but every lookup would then run in Python rather than as one hash probe
+		objmap = self.objmap
+
+		if isinstance(x, XRef):
+			# Iterate through offsets in xref and make map to objects
+			rows = x.offsets
+			for objid,offset,generation,inuse in zip(rows.objid, rows.offset, rows.generation, rows.inuse):
+				# Ignore if object is marked free
+				if not inuse:
+					continue
 
-			else:
-				raise TypeError("Unrecognized xref object type: %s" % x)
+				if objid in objmap:
+					# Already exists which means the offset is the old object and objmap[objid] is the newer object
+					pass
+				else:
+					# Object not mapped yet so map it to the offset
+					objmap[objid] = (offset, generation)
+
+		elif isinstance(x, XRefStream):
+			# Work from the stream's columns rather than making a row object per entry
+			types,f2s,f3s = x.StreamColumns
+
+			for objid,f1,f2,f3 in zip(x.StreamObjids, types, f2s, f3s):
+				# Type 0 is a free object and anything already mapped is an older version of a newer object, so skip both
+				if f1 == 0 or objid in objmap:
+					pass
+
+				elif f1 == 1:
+					# Offset (f2) and generation (f3) in the file
+					objmap[objid] = (f2, f3)
+
+				else:
+					# Tuple indicates object stream reference
+					# Object stream is (f2,0) as generation zero is assumed
+					# The offset (f3) is within the object stream
+					objmap[objid] = ( (IndirectObject.Make(f2, 0), f3), 0)
+
+		else:
+			raise TypeError("Unrecognized xref object type: %s" % x)
 
 
 class PDFBase:
-	# Tuple of (object id, generation), None if no id for this object
-	oid = None
+	# Slots let the small, numerous data types below (Hexstring, Array, etc.) go without a per-instance __dict__
+	# Subclasses that do not declare __slots__ get a __dict__ as usual
+	__slots__ = ('oid',)
 
 	def __init__(self):
-		pass
+		# Tuple of (object id, generation), None if no id for this object
+		self.oid = None
 
 # ------------------------------------------------------------------------------
 # ------------------------------------------------------------------------------
 # Data types
 
 class Hexstring(PDFBase):
-	string = None
+	__slots__ = ('string',)
+
+	def __init__(self):
+		PDFBase.__init__(self)
+		self.string = None
+
+	@staticmethod
+	def Make(string):
+		"""
+		Makes a Hexstring of @string without going through __init__, for the tokenizer's many conversions.
+		"""
+
+		o = object.__new__(Hexstring)
+		o.oid = None
+		o.string = string
+		return o
 
 class Dictionary(PDFBase):
 	"""
 	This object acts like a dictionary and permits item get and set as well as iteration.
 	"""
 
-	dictionary = None
+	__slots__ = ('_dictionary', '_raw', '_converter')
+
+	def __init__(self):
+		PDFBase.__init__(self)
+
+		# Converted values
+		self._dictionary = {}
+
+		# Unconverted values of every key in original order (None once all are converted) and the function that converts them
+		self._raw = None
+		self._converter = None
+
+	def SetRaw(self, raw, converter):
+		"""
+		Sets the values as unconverted @raw values (dictionary of key to raw value).
+		Each value is passed through @converter the first time it is accessed so entries never accessed are never converted.
+		"""
+
+		self._dictionary = {}
+		self._raw = raw
+		self._converter = converter
+
+	def get_dictionary(self):
+		# Convert anything not yet converted, keeping the original key order
+		raw = self._raw
+		if raw != None:
+			d = self._dictionary
+			conv = self._converter
+
+			ret = {}
+			for k,v in raw.items():
+				if k in d:		ret[k] = d[k]
+				else:			ret[k] = conv(v)
+
+			# Keys set after the raw values
+			for k in d:
+				if k not in ret:
+					ret[k] = d[k]
 
-	def __contains__(self, k):		return k in self.dictionary
-	def __getitem__(self, k):		return self.dictionary[k]
-	def __setitem__(self, k,v):		self.dictionary[k] = v
+			self._dictionary = ret
+			self._raw = None
 
-	def __iter__(self):				return iter(self.dictionary)
+		return self._dictionary
+
+	def set_dictionary(self, v):
+		self._dictionary = v
+		self._raw = None
+
+	dictionary = property(get_dictionary, set_dictionary, doc="Python dictionary of converted values")
+
+	def __contains__(self, k):
+		if k in self._dictionary:
+			return True
+
+		return self._raw != None and k in self._raw
+
+	def __getitem__(self, k):
+		d = self._dictionary
+		if k in d:
+			return d[k]
+
+		raw = self._raw
+		if raw != None and k in raw:
+			v = d[k] = self._converter(raw[k])
+			return v
+
+		raise KeyError(k)
+
+	def __setitem__(self, k,v):		self._dictionary[k] = v
+
+	def __iter__(self):
+		if self._raw == None:
+			return iter(self._dictionary)
+
+		return iter(list(self._raw) + [k for k in self._dictionary if k not in self._raw])
 
 	def __repr__(self):				return str(self)
 	def __str__(self):				return "<%s %s>" % (self.__class__.__name__, str(self.dictionary))
@@ -168,7 +256,11 @@ class Array(PDFBase):
 	This object acts like a list and permits item get and set as well as iteration and len.
 	"""
 
-	array = None
+	__slots__ = ('array',)
+
+	def __init__(self):
+		PDFBase.__init__(self)
+		self.array = None
 
 	def __len__(self):				return len(self.array)
 	def __getitem__(self, k):		return self.array[k]
@@ -183,9 +275,13 @@ class DoubleIndirectObject(PDFBase):
 	Thus, it points to an object stream then an object index within that stream.
 	"""
 
-	#objid = None
-	objstreamid = None
-	objstreamoffset = None
+	__slots__ = ('objstreamid', 'objstreamoffset')
+
+	def __init__(self):
+		PDFBase.__init__(self)
+		#self.objid = None
+		self.objstreamid = None
+		self.objstreamoffset = None
 
 	def __repr__(self):				return str(self)
 	def __str__(self):				return "<%s stream=%d offset=%d>" % (self.__class__.__name__, self.objstreamid, self.objstreamoffset)
@@ -195,13 +291,31 @@ class IndirectObject(PDFBase):
 	This object represents an indirect object reference (e.g., "12 0 R" for object id (objid) 12 and generation 0).
 	"""
 
-	objid = None
-	generation = None
+	__slots__ = ('objid', 'generation')
+
+	def __init__(self):
+		PDFBase.__init__(self)
+		self.objid = None
+		self.generation = None
+
+	@staticmethod
+	def Make(objid, generation):
+		"""
+		Makes a reference to @objid and @generation without going through __init__, for the tokenizer's many conversions.
+		"""
+
+		o = object.__new__(IndirectObject)
+		o.oid = None
+		o.objid = objid
+		o.generation = generation
+		return o
 
 	def __repr__(self):				return str(self)
 	def __str__(self):				return "<%s (%d %d R)>" % (self.__class__.__name__, self.objid, self.generation)
 
 class XRefRowFree:
+	__slots__ = ('objid', 'gen')
+
 	def __init__(self, objid, generation):
 		self.objid = objid
 		self.gen = generation
@@ -212,6 +326,8 @@ class XRefRowFree:
 		return "<XRefRowFree objid=(%d,%d)>" % (self.objid,self.gen)
 
 class XRefRowUsed:
+	__slots__ = ('objid', 'generation', 'offset')
+
 	def __init__(self, objid, offset, generation):
 		self.objid = objid
 		self.generation = generation
@@ -222,7 +338,55 @@ class XRefRowUsed:
 	def __str__(self):
 		return "<XRefRowUsed objid=(%d,%d) offset=%d>" % (self.objid,self.generation, self.offset)
 
+class XRefRows:
+	"""
+	Rows of a plaintext xref section stored as columns of packed integers rather than an object per row.
+	Indexing and iteration provide XRefRowUsed/XRefRowFree objects made on the fly.
+	"""
+
+	__slots__ = ('objid', 'offset', 'generation', 'inuse')
+
+	def __init__(self, rows=()):
+		"""
+		@rows is a sequence of (object id, offset, generation, in use) tuples.
+		"""
+		rows = list(rows)
+
+		self.objid = array.array('q', [r[0] for r in rows])
+		self.offset = array.array('q', [r[1] for r in rows])
+		self.generation = array.array('H', [r[2] for r in rows])
+		self.inuse = array.array('B', [r[3] for r in rows])
+
+	@staticmethod
+	def FromColumns(objid, offset, generation, inuse):
+		"""
+		Makes rows from separate sequences of object ids, offsets, generations and in use flags (0 or 1).
+		"""
+
+		o = XRefRows()
+		o.objid = array.array('q', objid)
+		o.offset = array.array('q', offset)
+		o.generation = array.array('H', generation)
+		o.inuse = array.array('B', inuse)
+
+		return o
+
+	def __len__(self):				return len(self.objid)
+	def __getitem__(self, k):
+		if self.inuse[k]:
+			return XRefRowUsed(objid=self.objid[k], offset=self.offset[k], generation=self.generation[k])
+		else:
+			return XRefRowFree(objid=self.objid[k], generation=self.generation[k])
+	def __iter__(self):
+		for i in range(len(self.objid)):
+			yield self[i]
+
+	def __repr__(self):				return str(self)
+	def __str__(self):				return "<%s rows=%d>" % (self.__class__.__name__, len(self.objid))
+
 class XRefRowCompressed:
+	__slots__ = ('objid', 'objstreamid', 'objstreamoffset')
+
 	def __init__(self, objid, objstreamid, objstreamoffset):
 		self.objid = objid
 		self.objstreamid = objstreamid
@@ -283,7 +447,7 @@ class StartXRef(PDFBase):
 class XRef(PDFBase):
 	"""
 	This object represents an xref section that precedes the trailer.
-	It consists of a sequence of offsets (XRefMapEntry objects) and the associated Trailer object.
+	It consists of a sequence of offsets (XRefRows object) and the associated Trailer object.
 	As the PDF is parsed, the xref/trailers are linked together so that they may be traversed in either direction.
 	NB: the next/prev nomenclature is opposite of that used within PDF (each trailer specifies
 	Prev entry whereas that object is set to next on this object). Sorry.
@@ -303,8 +467,8 @@ class XRef(PDFBase):
 		if self.next == None:		nextxref = "None"
 		else:						nextxref = "%x" % id(self.next)
 
-		minobjid = min([me.objid for me in self.offsets])
-		maxobjid = max([me.objid for me in self.offsets])
+		minobjid = min(self.offsets.objid)
+		maxobjid = max(self.offsets.objid)
 
 		return "<%s %x prev=%s next=%s trailer=%x objid=%d..%d>" % (self.__class__.__name__, id(self), prevxref, nextxref, id(self.trailer), minobjid, maxobjid)
 
@@ -614,46 +778,82 @@ class XRefStream(PDFStreamBase):
 			return [0, self.Dict['Size']]
 	Index = property(get_Index)
 
-	def get_StreamRows(self):
-		if '_StreamRows' in self.__dict__:
-			return self.__dict__['_StreamRows']
+	def get_StreamColumns(self):
+		"""
+		Unpacks the stream into columns rather than a row object per entry.
+		Returns a tuple of (row types, second fields, third fields), each an array indexed by row.
+		"""
+
+		if '_StreamColumns' in self.__dict__:
+			return self.__dict__['_StreamColumns']
 
 		# Copy these locally
-		rowsize = sum(self.W)
-		objidstart = self.Index[0]
-		size = self.Index[1]
+		# Index is pairs of (first object id, count), one per subsection, and rows for all of them follow one another
+		W = self.W
+		rowsize = sum(W)
+		size = sum(self.Index[1::2])
 
 		if rowsize*size > len(self.Stream):
 			raise ValueError("Xref stream row size=%d with %d rows should be greater than %d bytes but stream is %d bytes" % (rowsize, size, rowsize*size, len(self.Stream)))
 
 		buf = bytes(self.Stream, 'latin-1')
-		entries = []
+		end = rowsize*size
+
+		# Each field is a column of big-endian integers taken with a stride of the row size
+		cols = []
+		pos = 0
+		for w in W[0:3]:
+			if w == 0:
+				col = None
+			elif w == 1:
+				col = array.array('B', buf[pos:end:rowsize])
+			else:
+				col = array.array('q', [int.from_bytes(buf[i:i+w], 'big') for i in range(pos, end, rowsize)])
 
-		def unpack(bs):
-			return sum([bs[i]*(256**(len(bs)-i-1)) for i in range(len(bs))])
+			cols.append(col)
+			pos += w
 
-		def getbytes(cnt, _offset):
-			return unpack( struct.unpack_from("B" * cnt, buf, _offset) )
+		# Absent type field defaults to 1 (in use), absent others to zero
+		if cols[0] == None:		cols[0] = array.array('B', [1]) * size
+		if cols[1] == None:		cols[1] = array.array('q', [0]) * size
+		if cols[2] == None:		cols[2] = array.array('q', [0]) * size
 
-		ret = []
+		if size and max(cols[0]) > 2:
+			raise ValueError("Unrecognized xref stream row type: %d" % max(cols[0]))
 
-		cnt = 0
-		off = 0
-		while cnt < size:
-			f1 = getbytes(self.W[0], off)
-			f2 = getbytes(self.W[1], off + self.W[0])
-			f3 = getbytes(self.W[2], off + self.W[0] + self.W[1])
-			oid = cnt+objidstart
+		ret = tuple(cols)
+		self.__dict__['_StreamColumns'] = ret
+		return ret
+	StreamColumns = property(get_StreamColumns)
 
+	def get_StreamObjids(self):
+		"""
+		Object id of each row as an array, covering every subsection listed in Index, to go with StreamColumns.
+		"""
+
+		if '_StreamObjids' in self.__dict__:
+			return self.__dict__['_StreamObjids']
+
+		idx = self.Index
+		ret = array.array('q')
+		for first,count in zip(idx[0::2], idx[1::2]):
+			ret.extend(range(first, first + count))
+
+		self.__dict__['_StreamObjids'] = ret
+		return ret
+	StreamObjids = property(get_StreamObjids)
+
+	def get_StreamRows(self):
+		if '_StreamRows' in self.__dict__:
+			return self.__dict__['_StreamRows']
+
+		types,f2s,f3s = self.StreamColumns
+
+		ret = []
+		for oid,f1,f2,f3 in zip(self.StreamObjids, types, f2s, f3s):
 			if f1 == 0:			ret.append( XRefRowFree(oid, f2) )
 			elif f1 == 1:		ret.append( XRefRowUsed(oid, f2,f3) )
-			elif f1 == 2:		ret.append( XRefRowCompressed(oid, f2,f3) )
-			else:
-				raise ValueError("Unrecognized xref stream row type: %d" % f1)
-
-			# Skip to next entry
-			off += rowsize
-			cnt += 1
+			else:				ret.append( XRefRowCompressed(oid, f2,f3) )
 
 		self.__dict__['_StreamRows'] = ret
 		return ret
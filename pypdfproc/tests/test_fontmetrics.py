@@ -0,0 +1,70 @@
+"""
+Tests for loading font metrics (AFM) data.
+"""
+
+import gc, hashlib, os, unittest
+from zipfile import ZipFile
+
+from pypdfproc import fontmetrics
+
+def ReadAFM(name):
+	"""
+	Returns the text of standard font @name from the AFM zip file shipped with the package.
+	"""
+
+	z = ZipFile(os.path.join(os.path.dirname(fontmetrics.__file__), 'StandardFonts_AFM.zip'))
+	try:
+		fname = [_ for _ in z.namelist() if _.split('.')[0] == name][0]
+		return z.read(fname).decode('latin-1')
+	finally:
+		z.close()
+
+class SharedParseTest(unittest.TestCase):
+	def test_IdenticalTextShared(self):
+		txt = ReadAFM('Helvetica')
+
+		a = fontmetrics.FontMetricsData_String(txt)
+		b = fontmetrics.FontMetricsData_String(txt)
+
+		self.assertIs(a.CharMetrics, b.CharMetrics)
+		self.assertIs(a.Ligatures, b.Ligatures)
+		self.assertIs(a.Kerning, b.Kerning)
+		self.assertEqual(b.FontName, 'Helvetica')
+
+	def test_DifferentTextNotShared(self):
+		a = fontmetrics.FontMetricsData_String(ReadAFM('Helvetica'))
+		b = fontmetrics.FontMetricsData_String(ReadAFM('Courier'))
+
+		self.assertIsNot(a.CharMetrics, b.CharMetrics)
+		self.assertEqual(b.FontName, 'Courier')
+
+	def test_Released(self):
+		# Nothing should keep the text and tokenizer of a font that is no longer loaded
+		txt = ReadAFM('Times-Roman')
+		h = hashlib.sha1(txt.encode('utf-8')).digest()
+
+		a = fontmetrics.FontMetricsData_String(txt)
+		self.assertIn(h, fontmetrics._PARSED_BY_HASH)
+
+		del a
+		gc.collect()
+		self.assertNotIn(h, fontmetrics._PARSED_BY_HASH)
+
+		# Loading again still works
+		a = fontmetrics.FontMetricsData_String(txt)
+		self.assertEqual(a.FontName, 'Times-Roman')
+
+	def test_ReleasedOnceParsed(self):
+		# Parsing both sections drops the tokenizer, and with it the cached entry
+		txt = ReadAFM('Symbol')
+		h = hashlib.sha1(txt.encode('utf-8')).digest()
+
+		a = fontmetrics.FontMetricsData_String(txt)
+		a.CharMetrics
+		a.Kerning
+		gc.collect()
+		self.assertNotIn(h, fontmetrics._PARSED_BY_HASH)
+		self.assertTrue(len(a.CharMetrics))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,141 @@
+"""
+Tests that the fast paths in parser/pdf.py give the same results as the lexer and consolidation passes they stand in for.
+"""
+
+import unittest
+
+import ply.lex as plylex
+
+from pypdfproc.parser import pdf as pdfloc
+
+def Plain(v):
+	"""
+	Turns tokens, including consolidated tokens holding other tokens, into nested lists that can be compared.
+	"""
+
+	if isinstance(v, plylex.LexToken):
+		return [v.type, Plain(v.value), v.lexpos]
+	elif type(v) == list or type(v) == tuple:
+		return [Plain(_) for _ in v]
+	else:
+		return v
+
+# Object text with no streams, covering every kind of token the fast path handles
+OBJECTS = [
+	"1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj",
+	"12 3 obj [1 2.5 -3 +4 .5 -.25 true false null /Name#20x <0aF9> 7 0 R [ ] << >>] endobj",
+	"5 0 obj\r\n<</Kids[3 0 R 4 0 R]/Count 2/Nested<</A[<</B 1>>]>>>>\r\nendobj",
+	"6 0 obj (a (nested) literal with \\(escaped\\) parens) endobj",
+	"7 0 obj << /Title (endobj) /Author () >> endobj",
+	"8 0 obj\n% a comment\n<< /K /V % trailing comment\n>>\nendobj",
+	"9 0 obj << /Odd >> endobj",
+	"10 0 obj 42 endobj",
+	"11 0 obj << /A 1 0 R /B [1 0 R 2] /C 1 0 >> endobj",
+	"  \n\t13 0 obj <</Empty[]/EmptyD<<>>>>endobj  ",
+]
+
+class TokenizeStringFastTest(unittest.TestCase):
+	def test_SameAsTokenizeString(self):
+		for txt in OBJECTS:
+			fast = pdfloc.TokenizeStringFast(txt, stoptoken="endobj")
+			self.assertNotEqual(fast, None, txt)
+			self.assertEqual(Plain(fast), Plain(pdfloc.TokenizeString(txt, stoptoken="endobj")), txt)
+
+	def test_StopToken(self):
+		txt = "1 0 obj 5 endobj 2 0 obj 6 endobj"
+
+		fast = pdfloc.TokenizeStringFast(txt, stoptoken="endobj")
+		self.assertEqual(Plain(fast), Plain(pdfloc.TokenizeString(txt, stoptoken="endobj")))
+		self.assertEqual(fast[-1].type, 'endobj')
+		self.assertEqual(len(fast), 5)
+
+		# No stop token runs to the end
+		self.assertEqual(len(pdfloc.TokenizeStringFast(txt)), 10)
+
+	def test_FallBack(self):
+		# Streams need their length, and the other two are left to TokenizeString to report
+		for txt in ("1 0 obj << /Length 3 >> stream\nabc\nendstream endobj", "1 0 obj (unterminated endobj", "1 0 obj \x01 endobj"):
+			self.assertEqual(pdfloc.TokenizeStringFast(txt, stoptoken="endobj"), None, txt)
+
+class ConsolidateTokensTest(unittest.TestCase):
+	def Compare(self, txt):
+		# Consolidation passes modify the tokens, so each gets its own
+		new = pdfloc._ConsolidateTokens(pdfloc.TokenizeString(txt))
+		old = pdfloc.ConsolidateTokensClass.ConsolidateTokens(pdfloc.TokenizeString(txt))
+
+		self.assertNotEqual(new, None, txt)
+		self.assertEqual(Plain(new), Plain(old), txt)
+
+	def test_Objects(self):
+		for txt in OBJECTS:
+			self.Compare(txt)
+
+	def test_Bare(self):
+		# Object stream contents and content stream operands are not wrapped in "obj ... endobj"
+		self.Compare("<< /Type /Font /Widths [1 2 3] >> [4 0 R 5] 6 0 R 7 8")
+		self.Compare("1 2 3 R 4")
+
+	def test_EndstreamBetweenIntegers(self):
+		# "INT endstream INT R" is not a reference, since endstream is only stripped after references are found
+		self.Compare("[1 endstream 0 R]")
+
+	def test_FallBack(self):
+		# Left to the class: xref sections, trailers and anything unbalanced
+		for txt in ("xref 0 1 0000000000 65535 f", "trailer << /Size 1 >> startxref 0 %%EOF", "[1 2", "<< /A 1 >> >>"):
+			self.assertEqual(pdfloc._ConsolidateTokens(pdfloc.TokenizeString(txt)), None, txt)
+
+	def test_ConsolidateTokens(self):
+		# Module-level function picks whichever applies
+		txt = "trailer << /Size 1 >> startxref 0 %%EOF"
+		self.assertEqual(Plain(pdfloc.ConsolidateTokens(pdfloc.TokenizeString(txt))), Plain(pdfloc.ConsolidateTokensClass.ConsolidateTokens(pdfloc.TokenizeString(txt))))
+
+		txt = OBJECTS[1]
+		self.assertEqual(Plain(pdfloc.ConsolidateTokens(pdfloc.TokenizeString(txt))), Plain(pdfloc.ConsolidateTokensClass.ConsolidateTokens(pdfloc.TokenizeString(txt))))
+
+class ScanXRefTest(unittest.TestCase):
+	def Lexed(self, dat):
+		"""
+		Columns of xref section bytes @dat as found by the lexer and the xref consolidation pass.
+		"""
+
+		toks = pdfloc.ConsolidateTokens(pdfloc.TokenizeString(dat.decode('latin-1')))
+		rows = toks[0].value
+		return [[r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows], [1 if r[3] == 'n' else 0 for r in rows]]
+
+	def test_SameAsLexer(self):
+		dat = b"xref\n0 3\n0000000000 65535 f \n0000000015 00000 n \n0000000230 00002 n \n"
+		cols = pdfloc.ScanXRef(dat)
+		self.assertEqual([list(_) for _ in cols], self.Lexed(dat))
+		self.assertEqual(list(cols[3]), [0, 1, 1])
+
+		# CRLF rows
+		dat = b"xref\r\n0 2\r\n0000000000 65535 f\r\n0000000015 00000 n\r\n"
+		self.assertEqual([list(_) for _ in pdfloc.ScanXRef(dat)], self.Lexed(dat))
+
+	def test_Subsections(self):
+		dat = b"xref\n0 1\n0000000000 65535 f \n4 2\n0000000100 00000 n \n0000000200 00001 n \n"
+		cols = pdfloc.ScanXRef(dat)
+		self.assertEqual(list(cols[0]), [0, 4, 5])
+		self.assertEqual(list(cols[1]), [0, 100, 200])
+		self.assertEqual(list(cols[2]), [65535, 0, 1])
+
+	def test_FallBack(self):
+		for dat in (
+			b"",
+			b"0 1\n0000000000 65535 f \n",
+			# Count runs past the rows
+			b"xref\n0 3\n0000000000 65535 f \n",
+			# Flag that is neither n nor f
+			b"xref\n0 1\n0000000000 65535 x \n",
+			# Comment
+			b"xref\n0 1 % comment\n0000000000 65535 f \n",
+		):
+			self.assertEqual(pdfloc.ScanXRef(dat), None, dat)
+
+		# Rows run together are not split on whitespace, but the lexer still reads them
+		dat = b"xref\n0 2\n0000000000 65535 f0000000015 00000 n\n"
+		self.assertEqual(pdfloc.ScanXRef(dat), None)
+		self.assertEqual(self.Lexed(dat), [[0, 1], [0, 15], [65535, 0], [0, 1]])
+
+if __name__ == '__main__':
+	unittest.main()
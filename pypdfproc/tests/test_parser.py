@@ -0,0 +1,497 @@
+"""
+Tests for PDFTokenizer against small PDFs built in memory.
+"""
+
+import io, os, tempfile, unittest, warnings
+
+from pypdfproc import parser
+from pypdfproc import pdf as _pdf
+from pypdfproc.parser import pdf as pdfloc
+from pypdfproc.betterfile import betterfile
+
+def MakePDF(objs, root=1, pad=0):
+	"""
+	Makes the bytes of a PDF file with a plain xref section.
+	@objs is a dictionary of object number to object text (bytes, without the "N 0 obj"/"endobj" around it).
+	@pad bytes of comment are put ahead of the objects, to move them past the first block read.
+	"""
+
+	out = bytearray(b'%PDF-1.4\n')
+	if pad:
+		out += b'%' + b'x'*pad + b'\n'
+
+	offsets = {}
+	for k in sorted(objs):
+		offsets[k] = len(out)
+		out += ("%d 0 obj\n" % k).encode('latin-1') + objs[k] + b"\nendobj\n"
+
+	size = max(objs) + 1
+	startxref = len(out)
+	out += ("xref\n0 %d\n" % size).encode('latin-1')
+	out += b"0000000000 65535 f \n"
+	for k in range(1, size):
+		if k in offsets:
+			out += ("%010d 00000 n \n" % offsets[k]).encode('latin-1')
+		else:
+			out += b"0000000000 00000 f \n"
+	out += ("trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, root, startxref)).encode('latin-1')
+
+	return bytes(out)
+
+def MakeUpdate(dat, objs, prev=None, root=None):
+	"""
+	Appends an incremental update to PDF bytes @dat with the objects in @objs (as for MakePDF) and a trailer whose /Prev
+	is @prev, or the last startxref in @dat if not given.
+	/Prev is written as ten digits so a test can patch it to an offset only known later (eg, for a cycle).
+	Returns (bytes of the updated file, offset of the new xref section).
+	"""
+
+	if prev == None:
+		prev = int(dat[dat.rfind(b'startxref')+9:].split()[0])
+
+	out = bytearray(dat)
+
+	offsets = {}
+	for k in sorted(objs):
+		offsets[k] = len(out)
+		out += ("%d 0 obj\n" % k).encode('latin-1') + objs[k] + b"\nendobj\n"
+
+	startxref = len(out)
+	out += b"xref\n"
+	for k in sorted(objs):
+		out += ("%d 1\n%010d 00000 n \n" % (k, offsets[k])).encode('latin-1')
+
+	extra = ''
+	if root != None:
+		extra = " /Root %d 0 R" % root
+	out += ("trailer\n<< /Size 10 /Prev %010d%s >>\nstartxref\n%d\n%%%%EOF\n" % (prev, extra, startxref)).encode('latin-1')
+
+	return (bytes(out), startxref)
+
+def Native(v):
+	"""
+	Turns pdf.py objects into python values that can be compared.
+	"""
+
+	if isinstance(v, _pdf.Dictionary):
+		return dict( (k,Native(x)) for k,x in v.dictionary.items() )
+	elif isinstance(v, _pdf.Array):
+		return [Native(_) for _ in v.array]
+	elif type(v) == list:
+		return [Native(_) for _ in v]
+	elif isinstance(v, _pdf.IndirectObject):
+		return ('R', v.objid, v.generation)
+	elif isinstance(v, _pdf.Hexstring):
+		return ('Hexstring', v.string)
+	else:
+		return v
+
+class PDFFileTestCase(unittest.TestCase):
+	"""
+	Runs each test's PDF through both an in-memory file and a mapped file (betterfile), since PDFTokenizer reads them differently.
+	"""
+
+	def setUp(self):
+		self.tempfiles = []
+
+	def tearDown(self):
+		for f,fname in self.tempfiles:
+			f.close()
+			os.unlink(fname)
+
+	def Open(self, dat):
+		"""
+		Returns initialized PDFTokenizer objects for PDF bytes @dat, one per kind of file.
+		"""
+
+		fd,fname = tempfile.mkstemp(suffix='.pdf')
+		os.write(fd, dat)
+		os.close(fd)
+
+		f = betterfile.open(fname, 'rb')
+		self.tempfiles.append( (f,fname) )
+
+		ret = []
+		for f in (io.BytesIO(dat), f):
+			p = parser.PDFTokenizer(f)
+			p.Initialize()
+			ret.append(p)
+
+		return ret
+
+class LoadObjectTest(PDFFileTestCase):
+	def test_EndobjInName(self):
+		# "endobj" inside a name is not the end of the object
+		dat = MakePDF({
+			1: b"<< /Type /Catalog /Pages 2 0 R >>",
+			2: b"<< /Type /Pages /Foo /endobjBar /Kids [] /Count 0 >>",
+			3: b"<< /Foo /endobjBar /Bar [1 /endobj 2] >>",
+		})
+
+		for p in self.Open(dat):
+			n = p.GetRootObject().Pages
+			self.assertIsInstance(n, _pdf.PageTreeNode)
+			self.assertEqual(n.Count, 0)
+
+			d = p.GetDictionary(_pdf.IndirectObject.Make(3, 0))
+			self.assertEqual(d['Foo'], 'endobjBar')
+			self.assertEqual(d['Bar'].array, [1, 'endobj', 2])
+
+	def test_EndobjPastFirstBlock(self):
+		# Unmapped reads start with a 4 KiB block, so put the real endobj well past it and a false one inside it
+		big = b" ".join(("/K%d %d" % (i,i)).encode('latin-1') for i in range(1500))
+		dat = MakePDF({
+			1: b"<< /Type /Catalog /Pages 2 0 R >>",
+			2: b"<< /Type /Pages /Kids [] /Count 0 >>",
+			3: b"<< /Foo /endobjBar " + big + b" /Last (endobj) /End 7 >>",
+		})
+
+		for p in self.Open(dat):
+			d = p.GetDictionary(_pdf.IndirectObject.Make(3, 0))
+			self.assertEqual(d['Foo'], 'endobjBar')
+			self.assertEqual(d['K1499'], 1499)
+			self.assertEqual(d['Last'], 'endobj')
+			self.assertEqual(d['End'], 7)
+
+	def test_EndobjInLiteral(self):
+		dat = MakePDF({
+			1: b"<< /Type /Catalog /Pages 2 0 R >>",
+			2: b"<< /Type /Pages /Kids [] /Count 0 /Title (see endobj here) >>",
+		})
+
+		for p in self.Open(dat):
+			d = p.GetDictionary(_pdf.IndirectObject.Make(2, 0))
+			self.assertEqual(d['Title'], 'see endobj here')
+			self.assertEqual(d['Count'], 0)
+
+class XRefChainTest(PDFFileTestCase):
+	def MakeBase(self):
+		return MakePDF({
+			1: b"<< /Type /Catalog /Pages 2 0 R >>",
+			2: b"<< /Type /Pages /Kids [] /Count 0 >>",
+			3: b"<< /Version 1 >>",
+		})
+
+	def test_Incremental(self):
+		dat,x1 = MakeUpdate(self.MakeBase(), {3: b"<< /Version 2 >>", 4: b"<< /New true >>"})
+
+		for p in self.Open(dat):
+			# Only the newest section is read up front
+			self.assertEqual(sorted(p.pdf.objmap), [3, 4])
+			self.assertIs(p.pdf.rootxref.prev, None)
+
+			# Object only in the older section reads it
+			self.assertEqual(p.GetRootObject().Pages.Count, 0)
+			self.assertEqual(sorted(p.pdf.objmap), [1, 2, 3, 4])
+			self.assertIsNot(p.pdf.rootxref.prev, None)
+
+			# Newest version wins
+			self.assertEqual(p.GetDictionary(_pdf.IndirectObject.Make(3, 0))['Version'], 2)
+
+	def test_MakeXRefMap(self):
+		dat,x1 = MakeUpdate(self.MakeBase(), {3: b"<< /Version 2 >>"})
+
+		for p in self.Open(dat):
+			# Rebuilding the map reads the rest of the chain first
+			p.pdf.MakeXRefMap()
+			self.assertEqual(sorted(p.pdf.objmap), [1, 2, 3])
+			self.assertEqual(p.pdf.objmap[3][0], dat.rfind(b"3 0 obj"))
+			self.assertIsNot(p.pdf.rootxref.prev, None)
+
+	def test_Cycle(self):
+		base = self.MakeBase()
+		dat,x1 = MakeUpdate(base, {3: b"<< /Version 2 >>"}, prev=0)
+		dat,x2 = MakeUpdate(dat, {4: b"<< /New true >>"}, prev=x1)
+
+		# Point the older update back at the newer one
+		old = ("/Prev %010d" % 0).encode('latin-1')
+		dat = dat[:x1] + dat[x1:x2].replace(old, ("/Prev %010d" % x2).encode('latin-1')) + dat[x2:]
+
+		for p in self.Open(dat):
+			p.LoadXRefChain()
+			self.assertEqual(sorted(p.pdf.objmap), [3, 4])
+			self.assertEqual(p.xrefnext, 0)
+			self.assertEqual(len(p.xrefvisited), 2)
+
+			self.assertRaises(ValueError, p.GetDictionary, _pdf.IndirectObject.Make(1, 0))
+
+	def test_MaxPrevDepth(self):
+		dat = self.MakeBase()
+		for i in range(3):
+			dat,x = MakeUpdate(dat, {4+i: b"<< >>"})
+
+		depth = parser.MAX_PREV_DEPTH
+		parser.MAX_PREV_DEPTH = 2
+		try:
+			for p in self.Open(dat):
+				with warnings.catch_warnings(record=True) as w:
+					warnings.simplefilter('always')
+					p.LoadXRefChain()
+
+				self.assertEqual(len(w), 1)
+				self.assertEqual(sorted(p.pdf.objmap), [5, 6])
+				self.assertEqual(p.xrefnext, 0)
+		finally:
+			parser.MAX_PREV_DEPTH = depth
+
+	def test_BadPrev(self):
+		# /Prev pointing into an object rather than at an xref section
+		base = self.MakeBase()
+		dat,x1 = MakeUpdate(base, {4: b"<< /New true >>"}, prev=base.find(b"/Pages 2"))
+
+		for p in self.Open(dat):
+			# Fails the same way every time rather than the chain quietly ending after the first failure
+			for i in range(2):
+				self.assertRaises(Exception, p.LoadXRefChain)
+				self.assertFalse(p.xrefreading)
+				self.assertNotEqual(p.xrefnext, 0)
+
+class ParseTrailerTest(unittest.TestCase):
+	def Lexed(self, txt):
+		return parser.TokenHelpers.Convert_Trailer(pdfloc.ConsolidateTokens(pdfloc.TokenizeString(txt)))
+
+	def test_SameAsLexer(self):
+		for txt in (
+			"trailer\n<< /Size 7 /Root 1 0 R >>\nstartxref\n1234\n%%EOF",
+			"trailer<</Size 7/Root 1 0 R/Info 9 0 R/ID[<0aff><0AFF>]/Prev 100>>startxref 99 %%EOF",
+			"trailer\r\n<< /Size 3 /Nested << /A [1 2.5 true null] >>\r\n>>\r\nstartxref\r\n5\r\n%%EOF",
+		):
+			t = parser.TokenHelpers.Convert_TrailerText(txt)
+			self.assertNotEqual(t, None, txt)
+
+			l = self.Lexed(txt)
+			self.assertEqual(Native(t.dictionary), Native(l.dictionary), txt)
+			self.assertEqual(t.startxref.offset, l.startxref.offset, txt)
+
+	def test_FallBack(self):
+		# Literal strings are left to the full path
+		txt = "trailer << /Size 2 /ID [(abc) (d\\)ef)] >> startxref 10 %%EOF"
+		self.assertEqual(parser.TokenHelpers.Convert_TrailerText(txt), None)
+
+		for txt in ("<< /Size 2 >> startxref 10 %%EOF", "trailer << /Size 2 >> startxref %%EOF", "trailer << /Size >> startxref 1 %%EOF"):
+			self.assertEqual(parser.TokenHelpers.Convert_TrailerText(txt), None, txt)
+
+class ParseXRefTest(PDFFileTestCase):
+	def test_FallBack(self):
+		# Both go through ParseXRef and ParseTrailer, but only the first can take the fast paths
+		objs = {
+			1: b"<< /Type /Catalog /Pages 2 0 R >>",
+			2: b"<< /Type /Pages /Kids [] /Count 0 >>",
+		}
+		dat = MakePDF(objs)
+		# Row run into the next one is only split by the lexer, and a literal string is only converted by the full trailer path
+		slow = dat.replace(b"65535 f \n", b"65535 f").replace(b"/Root 1 0 R", b"/Root 1 0 R /ID [(a) (b)]")
+
+		for a,b in zip(self.Open(dat), self.Open(slow)):
+			xa = a.pdf.rootxref
+			xb = b.pdf.rootxref
+			for col in ('objid', 'offset', 'generation', 'inuse'):
+				self.assertEqual(list(getattr(xa.offsets, col)), list(getattr(xb.offsets, col)), col)
+
+			self.assertEqual(Native(xb.trailer.dictionary)['ID'], ['a', 'b'])
+			self.assertEqual(a.pdf.objmap, b.pdf.objmap)
+			self.assertEqual(b.GetRootObject().Pages.Count, 0)
+
+class CMapTest(unittest.TestCase):
+	CMAP = """/CIDInit /ProcSet findresource begin
+12 dict begin
+begincmap
+/CMapName /Test def
+1 begincodespacerange
+<0000> <FFFF>
+endcodespacerange
+2 beginbfchar
+<0020> <0020>
+<0021> <0041>
+endbfchar
+2 beginbfrange
+<0041> <0043> <0061>
+<0100> <0110> <0391>
+endbfrange
+1 beginbfrange
+<0200> <0201> <0030>
+endbfrange
+2 begincidrange
+<3000> <30ff> 200
+<1000> <1003> 50
+endcidrange
+endcmap
+"""
+
+	def Expected(self):
+		"""
+		Mapping as the CMap above defines it, written out entry by entry.
+		"""
+
+		ret = {0x20: ' ', 0x21: 'A'}
+		for s,e,u in ((0x41, 0x43, 0x61), (0x100, 0x110, 0x391), (0x200, 0x201, 0x30), (0x3000, 0x30ff, 200), (0x1000, 0x1003, 50)):
+			for c in range(s, e+1):
+				ret[c] = chr(u + c - s)
+		return ret
+
+	def test_Mapper(self):
+		m = parser.CMapTokenizer().BuildMapper(self.CMAP)
+
+		expected = self.Expected()
+		for c,v in expected.items():
+			self.assertEqual(m(c), v, hex(c))
+
+		# Characters are mapped by their code as well
+		self.assertEqual(m('!'), 'A')
+
+		# Just outside every range, and between ranges
+		for c in (0, 0x1f, 0x40, 0x44, 0xff, 0x111, 0x1ff, 0x202, 0x0fff, 0x1004, 0x2fff, 0x3100, 0xffff):
+			self.assertNotIn(c, expected)
+			self.assertRaises(KeyError, m, c)
+
+		self.assertRaises(TypeError, m, 1.0)
+
+class ObjectStreamTest(unittest.TestCase):
+	class Stream:
+		Dict = None
+		Stream = None
+
+	def MakeStream(self, objs):
+		"""
+		Makes an object stream object for @objs, a list of (object number, object text) in the order they are in the stream.
+		"""
+
+		body = ''
+		index = []
+		for oid,txt in objs:
+			index.append("%d %d" % (oid, len(body)))
+			body += txt + "\n"
+
+		head = " ".join(index) + "\n"
+
+		o = ObjectStreamTest.Stream()
+		o.Dict = {'N': len(objs), 'First': len(head)}
+		o.Stream = head + body
+		return o
+
+	def test_Objects(self):
+		objs = [
+			(4, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"),
+			(5, "[1 0 R 2 (lit) <0a>]"),
+			(6, "42"),
+			(7, "<< /A << /B [3 0 R] >> >>"),
+		]
+		ost = parser.ObjectStreamTokenizer(self.MakeStream(objs))
+
+		# Lazy: nothing is consolidated until asked for, and only the object asked for
+		ost.Process()
+		self.assertEqual(ost.Objects, {})
+
+		toks = ost.GetObjectTokens(2)
+		self.assertEqual(list(ost.Objects), [2])
+		self.assertIs(ost.GetObjectTokens(2), toks)
+
+		for i,(oid,txt) in enumerate(objs):
+			expected = pdfloc.ConsolidateTokens(pdfloc.TokenizeString(txt))
+			got = ost.GetObjectTokens(i)
+			self.assertEqual(Native(parser.TokenHelpers.Convert(got)), Native(parser.TokenHelpers.Convert(expected)), txt)
+
+		self.assertEqual(sorted(ost.Objects), [0, 1, 2, 3])
+
+	def Linear(self, ost):
+		"""
+		Tokens of each object found by checking the position of every token, as Process did before it kept token ranges.
+		"""
+
+		toks = ost.Tokens
+		vals = [_.value for _ in toks[0:(ost.N*2)]]
+		offs = vals[1::2] + [len(ost.ObjectStream.Stream)]
+
+		ret = []
+		for i in range(ost.N):
+			startidx = offs[i] + ost.First
+			endidx = offs[i+1] + ost.First - 1
+			ret.append( [_ for _ in toks if _.lexpos >= startidx and _.lexpos <= endidx] )
+		return ret
+
+	def test_Ranges(self):
+		# Index entries are normally in offset order, but need not be
+		for objs in (
+			[(4, "1"), (5, "[2 3]"), (6, "<< /X 4 >>"), (7, "(lit) 5")],
+			[(7, "<< /Y [1 2] >>"), (6, "3"), (5, "true"), (4, "null")],
+		):
+			o = self.MakeStream(objs)
+			head,body = o.Stream.split("\n", 1)
+
+			for order in ([0, 1, 2, 3], [2, 0, 3, 1], [3, 2, 1, 0]):
+				offs = [int(_) for _ in head.split()[1::2]]
+				o.Stream = " ".join("%d %d" % (objs[i][0], offs[i]) for i in order) + "\n"
+				o.Dict['First'] = len(o.Stream)
+				o.Stream += body
+
+				ost = parser.ObjectStreamTokenizer(o)
+				ost.Process()
+
+				linear = self.Linear(ost)
+				for i in range(len(objs)):
+					oid,lo,hi = ost.Ranges[i]
+					self.assertEqual(oid, objs[order[i]][0])
+					self.assertEqual(ost.Tokens[lo:hi], linear[i], (objs, order, i))
+
+class GetObjectTest(PDFFileTestCase):
+	def setUp(self):
+		PDFFileTestCase.setUp(self)
+
+		objs = {1: b"<< /Type /Catalog /Pages 2 0 R >>", 2: b"<< /Type /Pages /Kids [] /Count 0 >>"}
+		for i in range(3, 10):
+			objs[i] = ("<< /N %d >>" % i).encode('latin-1')
+
+		self.p = self.Open(MakePDF(objs))[0]
+		self.calls = []
+
+	def Handler(self, objid, tokens):
+		self.calls.append(objid)
+		return self.p._ParseDictionary(objid, tokens)
+
+	def test_Cached(self):
+		p = self.p
+
+		ind = _pdf.IndirectObject.Make(3, 0)
+		a = p.GetObject(ind, self.Handler)
+		self.assertEqual(a['N'], 3)
+
+		# Same reference (hot list) and an equal one (object cache) both get the loaded object
+		self.assertIs(p.GetObject(ind, self.Handler), a)
+		self.assertIs(p.GetObject(_pdf.IndirectObject.Make(3, 0), self.Handler), a)
+		self.assertEqual(self.calls, [(3, 0)])
+
+		self.assertIs(p.pdf.objcache[(3 << 16) | 0], a)
+
+	def test_HotList(self):
+		p = self.p
+
+		inds = [_pdf.IndirectObject.Make(i, 0) for i in range(3, 10)]
+		objs = [p.GetObject(ind, self.Handler) for ind in inds]
+
+		# Newest first and no longer than HOTOBJECTS_SIZE
+		self.assertEqual(len(p.hotobjects), p.HOTOBJECTS_SIZE)
+		self.assertEqual([h[0] for h in p.hotobjects], inds[::-1][:p.HOTOBJECTS_SIZE])
+
+		# Fell off the hot list but still cached
+		self.assertIs(p.GetObject(inds[0], self.Handler), objs[0])
+		self.assertIs(p.hotobjects[0][0], inds[0])
+		self.assertEqual(len(self.calls), len(inds))
+
+	def test_CachedNone(self):
+		p = self.p
+
+		def handler(objid, tokens):
+			self.calls.append(objid)
+			return None
+
+		ind = _pdf.IndirectObject.Make(4, 0)
+		self.assertEqual(p.GetObject(ind, handler), None)
+		self.assertEqual(p.GetObject(_pdf.IndirectObject.Make(4, 0), handler), None)
+		self.assertEqual(self.calls, [(4, 0)])
+
+	def test_Missing(self):
+		self.assertRaises(ValueError, self.p.GetObject, _pdf.IndirectObject.Make(20, 0), self.Handler)
+		self.assertRaises(TypeError, self.p.GetObject, (3, 0), self.Handler)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,130 @@
+"""
+Tests for the data types that use __slots__, built both through __init__ and through their Make/FromColumns constructors.
+Slots have no class-level default, so any attribute a constructor forgets to set raises AttributeError when read.
+"""
+
+import os, unittest
+from zipfile import ZipFile
+
+from pypdfproc import pdf as _pdf
+from pypdfproc import fontmetrics
+from pypdfproc.parser import fontmetrics as fmloc
+
+def slotnames(cls):
+	"""
+	Every slot name declared by @cls and its base classes.
+	"""
+
+	ret = []
+	for c in cls.__mro__:
+		s = c.__dict__.get('__slots__', ())
+		if type(s) == str:
+			s = (s,)
+		ret.extend(s)
+
+	return ret
+
+class SlotsTestCase(unittest.TestCase):
+	def assertSlots(self, o, expected):
+		"""
+		Reads back every slot of @o, comparing against @expected (dictionary of slot name to value) where given.
+		"""
+
+		for k in slotnames(o.__class__):
+			# Raises AttributeError if the constructor did not set it
+			v = getattr(o, k)
+
+			if k in expected:
+				self.assertEqual(v, expected[k], "%s.%s" % (o.__class__.__name__, k))
+
+		# Every expected value should name a slot
+		for k in expected:
+			self.assertIn(k, slotnames(o.__class__))
+
+class PDFTypesTest(SlotsTestCase):
+	def test_PDFBase(self):
+		self.assertSlots(_pdf.PDFBase(), {'oid': None})
+
+	def test_Hexstring(self):
+		o = _pdf.Hexstring()
+		self.assertSlots(o, {'oid': None, 'string': None})
+
+		o = _pdf.Hexstring.Make('0A1F')
+		self.assertIs(type(o), _pdf.Hexstring)
+		self.assertSlots(o, {'oid': None, 'string': '0A1F'})
+
+	def test_Dictionary(self):
+		o = _pdf.Dictionary()
+		self.assertSlots(o, {'oid': None, '_dictionary': {}, '_raw': None, '_converter': None})
+		self.assertEqual(o.dictionary, {})
+
+		o.SetRaw({'Type': 'Page', 'Count': '3'}, int)
+		self.assertEqual(o['Count'], 3)
+		self.assertEqual(list(o), ['Type', 'Count'])
+
+	def test_Array(self):
+		self.assertSlots(_pdf.Array(), {'oid': None, 'array': None})
+
+	def test_DoubleIndirectObject(self):
+		self.assertSlots(_pdf.DoubleIndirectObject(), {'oid': None, 'objstreamid': None, 'objstreamoffset': None})
+
+	def test_IndirectObject(self):
+		o = _pdf.IndirectObject()
+		self.assertSlots(o, {'oid': None, 'objid': None, 'generation': None})
+
+		o = _pdf.IndirectObject.Make(12, 3)
+		self.assertIs(type(o), _pdf.IndirectObject)
+		self.assertSlots(o, {'oid': None, 'objid': 12, 'generation': 3})
+		self.assertEqual(str(o), "<IndirectObject (12 3 R)>")
+
+	def test_XRefRowFree(self):
+		self.assertSlots(_pdf.XRefRowFree(objid=5, generation=1), {'objid': 5, 'gen': 1})
+
+	def test_XRefRowUsed(self):
+		self.assertSlots(_pdf.XRefRowUsed(objid=5, offset=1234, generation=0), {'objid': 5, 'offset': 1234, 'generation': 0})
+
+	def test_XRefRowCompressed(self):
+		self.assertSlots(_pdf.XRefRowCompressed(7, 20, 2), {'objid': 7, 'objstreamid': 20, 'objstreamoffset': 2})
+
+	def test_XRefRows(self):
+		rows = [(0, 0, 65535, 0), (1, 15, 0, 1), (2, 230, 2, 1)]
+
+		for o in (_pdf.XRefRows(rows), _pdf.XRefRows.FromColumns([0,1,2], [0,15,230], [65535,0,2], [0,1,1])):
+			self.assertSlots(o, {})
+			self.assertEqual(list(o.objid), [0, 1, 2])
+			self.assertEqual(list(o.offset), [0, 15, 230])
+			self.assertEqual(list(o.generation), [65535, 0, 2])
+			self.assertEqual(list(o.inuse), [0, 1, 1])
+
+			self.assertEqual(len(o), 3)
+			self.assertIs(type(o[0]), _pdf.XRefRowFree)
+			self.assertSlots(o[0], {'objid': 0, 'gen': 65535})
+			self.assertIs(type(o[2]), _pdf.XRefRowUsed)
+			self.assertSlots(o[2], {'objid': 2, 'offset': 230, 'generation': 2})
+
+		self.assertEqual(len(_pdf.XRefRows()), 0)
+
+	def test_NoInstanceDict(self):
+		# Only worthwhile if every class in the hierarchy has slots
+		for cls in (_pdf.Hexstring, _pdf.Dictionary, _pdf.Array, _pdf.DoubleIndirectObject, _pdf.IndirectObject, _pdf.XRefRowFree, _pdf.XRefRowUsed, _pdf.XRefRows, _pdf.XRefRowCompressed):
+			self.assertFalse(hasattr(cls.__new__(cls), '__dict__'), cls.__name__)
+
+class FontMetricsTypesTest(SlotsTestCase):
+	def test_FontMetricsData(self):
+		o = fontmetrics.FontMetricsData()
+		self.assertSlots(o, dict( (k,None) for k in slotnames(fontmetrics.FontMetricsData) ))
+
+	def test_FontMetricsData_String(self):
+		z = ZipFile(os.path.join(os.path.dirname(fontmetrics.__file__), 'StandardFonts_AFM.zip'))
+		fname = [_ for _ in z.namelist() if _.startswith('Helvetica.')][0]
+		o = fontmetrics.FontMetricsData_String(z.read(fname).decode('latin-1'))
+		z.close()
+
+		self.assertSlots(o, {'FontName': 'Helvetica', 'filename': None})
+		self.assertEqual(o.CharMetrics['A']['W'], (667, 0))
+
+	def test_ScanToken(self):
+		self.assertSlots(fmloc.ScanToken('KPX', (('A', 'V'), -70)), {'type': 'KPX', 'value': (('A', 'V'), -70)})
+
+if __name__ == '__main__':
+	unittest.main()
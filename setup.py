@@ -56,6 +56,7 @@ data_files = [
 							'pypdfproc/parser/cff.py',
 							'pypdfproc/parser/cmap.py',
 							'pypdfproc/parser/fontmetrics.py',
+							'pypdfproc/parser/lexutil.py',
 							'pypdfproc/parser/pdf.py',
 							'pypdfproc/parser/state.py',
 							'pypdfproc/parser/text.py',